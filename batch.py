@@ -0,0 +1,243 @@
+import numpy as np # type: ignore
+
+from gamedata import *
+from classes import MAX_FOES, TURN_LIMIT, BattleManager, PopulationBrain
+
+# Motor de batalhas em lote (lockstep)
+# Simula N batalhas ao mesmo tempo, com todo o estado guardado em arrays do NumPy
+# Cada passo avança um turno de todas as batalhas que ainda não acabaram
+# Segue exatamente as regras do BattleManager.battleLoop, então com o mesmo seed
+# dá os mesmos resultados, dano e cura de cada batalha
+
+SLOTS = 1 + MAX_FOES # Slot 0 é o herói, o resto são os inimigos
+
+class BatchBattleManager:
+    def __init__(self, hero_id=0):
+        self.hero_id = hero_id
+        self.hero_moves = np.array(charSheet[hero_id]["movelist"])
+        self.turns_saved = 0 # Mesmo contador do BattleManager, mas o lote não detecta ciclos (fica sempre 0)
+
+    # Monta o estado inicial de N batalhas
+    # members[i] diz qual genoma da população joga a batalha i
+    def setup(self, genomes, encounters, members=None):
+        n = len(encounters)
+        self.brain = PopulationBrain(genomes)
+        self.members = np.arange(n) if members is None else np.asarray(members)
+
+        # Tipo de cada slot, -1 = slot vazio
+        self.typeID = np.full((n, SLOTS), -1)
+        self.typeID[:, 0] = self.hero_id
+        for i, foes in enumerate(encounters):
+            self.typeID[i, 1:1 + len(foes)] = foes
+        self.exists = self.typeID >= 0
+        self.arenaPlayers = self.exists.sum(axis=1)
+        self.isHero = np.zeros((n, SLOTS), dtype=bool)
+        self.isHero[:, 0] = True
+
+        # Status base (slots vazios ficam com zero)
+        t = np.where(self.exists, self.typeID, 0)
+        self.maxHP = np.where(self.exists, CHAR_HP[t], 0.0)
+        self.maxSP = np.where(self.exists, CHAR_SP[t], 0.0)
+        self.maxMP = np.where(self.exists, CHAR_MP[t], 0.0)
+        self.element = CHAR_ELEM[t]
+        self.statStr, self.statDex, self.statInt = CHAR_STR[t], CHAR_DEX[t], CHAR_INT[t]
+        self.statDef, self.statWis = CHAR_DEF[t], CHAR_WIS[t]
+
+        # Estado atual (mesmo começo do Character)
+        self.HP = self.maxHP.copy()
+        self.SP = 0.5 * self.maxSP
+        self.MP = self.maxMP.copy()
+        self.isAlive = self.exists.copy()
+
+        # Contadores de cada batalha
+        self.turn = np.zeros(n, dtype=np.int64)
+        self.falseTurn = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.outcome = np.zeros(n, dtype=np.int64)
+        self.total_damage_dealt = np.zeros(n)
+        self.total_healed = np.zeros(n)
+        self.enemy_max_hp_total = (self.maxHP * ~self.isHero).sum(axis=1)
+
+    # Loop principal, roda todas as batalhas até o fim
+    # genomes: (N, tamanho do genoma), um genoma por batalha
+    #          ou a população (P, tamanho do genoma) junto com members (N,) dizendo quem joga cada batalha
+    # encounters: lista de N encontros, se não for passado sorteia igual ao battleLoop
+    def battleLoop(self, genomes, encounters=None, members=None):
+        if encounters is None:
+            n = len(genomes) if members is None else len(members)
+            encounters = [BattleManager.rollEncounter() for _ in range(n)]
+        self.setup(genomes, encounters, members)
+
+        while not self.done.all():
+            self.step()
+        return self.outcome, self.total_damage_dealt, self.enemy_max_hp_total, self.total_healed
+
+    # Avança um turno de todas as batalhas ainda ativas
+    def step(self):
+        active = np.flatnonzero(~self.done)
+        rows = np.arange(len(active))
+
+        # Quem deve ser o próximo a se movimentar (primeiro vivo a partir do falseTurn)
+        players = self.arenaPlayers[active]
+        offsets = np.arange(SLOTS)
+        order = (self.falseTurn[active, None] + offsets) % players[:, None]
+        firstAlive = np.argmax(self.isAlive[active[:, None], order], axis=1)
+        self.falseTurn[active] += firstAlive
+        actor = order[rows, firstAlive]
+
+        # Pede o movimento de cada ator
+        move = np.zeros(len(active), dtype=np.int64)
+        targets = np.zeros((len(active), SLOTS), dtype=bool)
+        heroTurn = self.isHero[active, actor]
+        if heroTurn.any():
+            move[heroTurn], targets[heroTurn] = self.heroMoves(active[heroTurn], actor[heroTurn])
+        if (~heroTurn).any():
+            move[~heroTurn], targets[~heroTurn] = self.foeMoves(active[~heroTurn], actor[~heroTurn])
+
+        # Sem alvos (mesmo [WARN] do requestMove): perde a vez sem gastar recursos
+        noTarget = ~targets.any(axis=1)
+        if noTarget.any():
+            self.turn[active[noTarget]] += 1
+            self.falseTurn[active[noTarget]] += 1
+        acts = ~noTarget
+        self.applyMoves(active[acts], actor[acts], move[acts], targets[acts])
+
+        # Fim de turno
+        self.checkDeaths(active)
+
+    # Scores do cérebro para cada par (Golpe, Alvo), mesma ordem do getMove
+    def heroMoves(self, idx, actor):
+        n = len(idx)
+        r = np.arange(n)
+        moves = self.hero_moves
+        L = len(moves)
+
+        # Golpes que dá pra pagar
+        canPay = affordable(moves[None, :], self.SP[idx, actor][:, None], self.MP[idx, actor][:, None])
+
+        # Alvos válidos de cada golpe
+        enemies = self.isAlive[idx] & (self.isHero[idx] != self.isHero[idx, actor][:, None])
+        firstEnemy = np.zeros((n, SLOTS), dtype=bool)
+        hasEnemy = enemies.any(axis=1)
+        firstEnemy[r[hasEnemy], np.argmax(enemies[hasEnemy], axis=1)] = True
+        selfSlot = np.zeros((n, SLOTS), dtype=bool)
+        selfSlot[r, actor] = True
+
+        tgtKind = MOVE_TARGET[moves]
+        valid = np.where((tgtKind == 1)[None, :, None], selfSlot[:, None, :],
+                np.where((tgtKind == 2)[None, :, None], firstEnemy[:, None, :], enemies[:, None, :]))
+        valid &= canPay[:, :, None]
+
+        # Inputs (n, L, SLOTS, 12), igual ao get_action_inputs
+        inputs = np.zeros((n, L, SLOTS, 12))
+        raw_hp = self.HP[idx, actor] / self.maxHP[idx, actor]
+        inputs[..., 0] = np.minimum(1.0, 1.0 - raw_hp)[:, None, None]
+        inputs[..., 1] = np.minimum(1.0, self.SP[idx, actor] / self.maxSP[idx, actor])[:, None, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inputs[..., 2] = np.minimum(1.0, self.HP[idx] / self.maxHP[idx])[:, None, :]
+        inputs[..., 3] = np.minimum(1.0, self.maxHP[idx] / 1000.0)[:, None, :]
+        inputs[..., 4] = selfSlot[:, None, :]
+        inputs[..., 5:9] = MOVE_FEATURES[moves][None, :, None, :]
+        inputs[..., 9] = ADVANTAGE[MOVE_ELEM[moves][None, :, None], self.element[idx][:, None, :]]
+        inputs[..., 10] = (self.arenaPlayers[idx] / 4.0)[:, None, None]
+        inputs[..., 11] = ((self.isAlive[idx] & ~self.isHero[idx]).sum(axis=1) / 3.0)[:, None, None]
+
+        # Forward pass de todos os candidatos de uma vez
+        inputs = inputs.reshape(n, L * SLOTS, 12)
+        scores = self.brain.predict(inputs, self.members[idx])
+        scores = np.where(valid.reshape(n, L * SLOTS), scores, -np.inf)
+
+        # Primeiro melhor score ganha (mesmo desempate do ">" do getMove)
+        best = np.argmax(scores, axis=1)
+        bestMove = moves[best // SLOTS]
+        targets = np.zeros((n, SLOTS), dtype=bool)
+        targets[r, best % SLOTS] = True
+        isAoe = MOVE_TARGET[bestMove] == 2
+        targets[isAoe] = enemies[isAoe] # AoE pega todos inimigos vivos
+        return bestMove, targets
+
+    # Algoritmo procedural: o golpe mais forte no inimigo com menos vida
+    def foeMoves(self, idx, actor):
+        n = len(idx)
+        r = np.arange(n)
+        moves = CHAR_MOVES[self.typeID[idx, actor]]
+        safe = np.maximum(moves, 0)
+        usable = (moves >= 0) & affordable(safe, self.SP[idx, actor][:, None], self.MP[idx, actor][:, None]) & \
+                 (MOVE_TARGET[safe] != 1)
+        power = np.where(usable, MOVE_POWER[safe], -1.0)
+        best = np.argmax(power, axis=1)
+        strongestMove = np.where(power[r, best] > -1, moves[r, best], 0)
+
+        enemies = self.isAlive[idx] & (self.isHero[idx] != self.isHero[idx, actor][:, None])
+        weakest = np.argmin(np.where(enemies, self.HP[idx], np.inf), axis=1)
+        targets = np.zeros((n, SLOTS), dtype=bool)
+        targets[r, weakest] = True
+        targets &= enemies
+        isAoe = MOVE_TARGET[strongestMove] == 2
+        targets[isAoe] = enemies[isAoe]
+        return strongestMove, targets
+
+    # Aplica os movimentos escolhidos e desconta os recursos
+    def applyMoves(self, idx, actor, move, targets):
+        heroActs = self.isHero[idx, actor]
+        power = MOVE_POWER[move]
+        isSelf = MOVE_TARGET[move] == 1
+
+        # Dano nos alvos
+        hit = targets & ~isSelf[:, None]
+        if hit.any():
+            b, s = np.nonzero(hit)
+            bi, a, m = idx[b], actor[b], move[b]
+            mult = TYPE_MATRIX[MOVE_ELEM[m], self.element[bi, s]]
+            kind = MOVE_TYPE[m]
+            statMult = np.where(kind == 0, self.statStr[bi, a] - self.statDef[bi, s],
+                       np.where(kind == 1, self.statDex[bi, a] - self.statDef[bi, s],
+                                self.statInt[bi, a] - self.statWis[bi, s]))
+            damage = power[b] * mult * (1 + (statMult / 100))
+            damage = np.maximum(1, np.trunc(damage)) # Garante min 1 de dano e inteiro
+
+            preHP = self.HP[bi, s]
+            postHP = np.where(preHP > 0, preHP - damage, preHP)
+            died = postHP <= 0
+            postHP = np.minimum(np.where(died, 0, postHP), self.maxHP[bi, s])
+            self.HP[bi, s] = postHP
+            self.isAlive[bi, s] &= ~died
+            np.add.at(self.total_damage_dealt, bi, np.where(heroActs[b], preHP - postHP, 0))
+
+        # Cura no próprio usuário
+        if isSelf.any():
+            bi, a = idx[isSelf], actor[isSelf]
+            heal_amount = self.maxHP[bi, a] * (power[isSelf] / 100)
+            old_hp = self.HP[bi, a]
+            new_hp = np.minimum(np.where(old_hp > 0, old_hp + heal_amount, old_hp), self.maxHP[bi, a])
+            self.HP[bi, a] = new_hp
+            self.total_healed[bi] += np.where(heroActs[isSelf], new_hp - old_hp, 0)
+
+        # Recursos Consumidos
+        sp = self.SP[idx, actor]
+        sp = np.minimum(np.where(sp > 0, sp - MOVE_SP[move], sp), self.maxSP[idx, actor])
+        mp = self.MP[idx, actor]
+        mp = np.maximum(0, np.where(mp > 0, mp - MOVE_MP[move], mp))
+
+        # Regen passivo de SP para o heroi
+        sp = np.where(heroActs & (sp > 0), np.minimum(sp + 0.2 * self.maxSP[idx, actor], self.maxSP[idx, actor]), sp)
+        self.SP[idx, actor] = sp
+        self.MP[idx, actor] = mp
+
+    # Verifica o fim das batalhas e avança os turnos das que continuam
+    def checkDeaths(self, idx):
+        alive = self.isAlive[idx]
+        heroAlive = (alive & self.isHero[idx]).any(axis=1)
+        foeAlive = (alive & ~self.isHero[idx]).any(axis=1)
+        status = np.where(~heroAlive, -1, np.where(~foeAlive, 1, 0))
+
+        # Limite de segurança vem antes do resultado, igual ao battleLoop
+        exhausted = self.turn[idx] > TURN_LIMIT
+        status = np.where(exhausted, 0, status)
+        finished = exhausted | (status != 0)
+
+        self.done[idx[finished]] = True
+        self.outcome[idx[finished]] = status[finished]
+        going = idx[~finished]
+        self.turn[going] += 1
+        self.falseTurn[going] += 1
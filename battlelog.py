@@ -0,0 +1,324 @@
+import os
+import sys
+import time
+import zlib
+import numpy as np # type: ignore
+
+from classes import BattleManager, charSheet, moveSheet, MOVE_ROWS, TYPE_MULT
+
+# Registro de batalhas: cada ação vira um registro de tamanho fixo num log binário que só cresce,
+# e cada batalha ganha uma entrada num índice ao lado (TRACE_FILE + ".idx")
+# Serve para rever exatamente as lutas do treino (ex: as derrotas e empates de um campeão)
+# sem simular de novo: o replay pula direto para a batalha N pelo índice
+#
+# Layout (little-endian):
+#   Log (TRACE_FILE):   MAGIC + uint32 tamanho do registro, zeros até 16 bytes, depois os registros
+#     Registro (72 bytes): turno (uint16), quem agiu (uint8), golpe (uint8), alvos (uint8, bit k = slot k),
+#                          super efetivo, pouco efetivo e valor inteiro (uint8, bit k = slot k),
+#                          e float32 por slot: valor (dano ou cura), HP, SP, MP depois da ação
+#     O primeiro registro de cada batalha (quem agiu = NO_ACTOR) guarda o estado inicial
+#     Uma vez perdida por falta de alvos fica como um registro sem alvos
+#     Um registro NO_ACTOR no fim marca um ciclo pulado, com o estado final
+#   Índice (TRACE_FILE.idx): INDEX_MAGIC + uint32 tamanho da entrada, zeros até 16 bytes, depois as entradas
+#     Entrada: posição e quantidade dos registros, geração, CRC32 do genoma, resultado, turnos,
+#              personagem e HP máximo de cada slot, dano e cura totais do herói
+#
+# Os registros de uma batalha sempre chegam no disco antes da entrada dela no índice,
+# então um treino que morre no meio deixa um arquivo válido até a última batalha indexada
+
+MAGIC = b"RPGTRACE"
+INDEX_MAGIC = b"RPGTRIDX"
+HEADER_SIZE = 16
+SLOTS = 4 # Herói + MAX_FOES inimigos
+NO_ACTOR = 255
+FLUSH_BATTLES = 256 # Batalhas na memória antes de ir pro disco
+ZERO_AMOUNTS = (0.0,) * SLOTS
+REPLAY_DELAY = 0.3 # Pausa padrão entre os turnos do replay (segundos), bem mais rápido que o modo verbose
+
+RECORD = np.dtype([
+    ("turn", "<u2"), ("actor", "u1"), ("move", "u1"), ("targets", "u1"), ("strong", "u1"), ("weak", "u1"), ("whole", "u1"),
+    ("amount", "<f4", (SLOTS,)), ("hp", "<f4", (SLOTS,)), ("sp", "<f4", (SLOTS,)), ("mp", "<f4", (SLOTS,)),
+])
+INDEX = np.dtype([
+    ("offset", "<u8"), ("count", "<u4"), ("generation", "<i4"), ("genome", "<u4"),
+    ("outcome", "i1"), ("slots", "u1"), ("turns", "<u2"),
+    ("types", "i1", (SLOTS,)), ("max_hp", "<f4", (SLOTS,)), ("damage", "<f4"), ("healed", "<f4"),
+])
+
+# CRC32 dos bytes do genoma, identifica de quem é a batalha (o mesmo do cabeçalho do genomefile.py)
+def genome_crc(genome):
+    return zlib.crc32(np.ascontiguousarray(genome).tobytes())
+
+def _header(magic, itemsize):
+    return (magic + np.uint32(itemsize).tobytes()).ljust(HEADER_SIZE, b"\0")
+
+def _check_header(data, magic, dtype, filename):
+    if len(data) < HEADER_SIZE or data[:len(magic)] != magic:
+        raise ValueError(f"'{filename}' não é um registro de batalhas")
+    itemsize = int(np.frombuffer(data, dtype="<u4", count=1, offset=len(magic))[0])
+    if itemsize != dtype.itemsize:
+        raise ValueError(f"'{filename}' tem registros de {itemsize} bytes, esperado {dtype.itemsize}")
+
+# Entradas do índice, sem a última se ela estiver pela metade
+def _read_index(filename):
+    with open(filename, "rb") as f:
+        data = f.read()
+    _check_header(data, INDEX_MAGIC, INDEX, filename)
+    count = (len(data) - HEADER_SIZE) // INDEX.itemsize
+    return np.frombuffer(data, dtype=INDEX, count=count, offset=HEADER_SIZE)
+
+# Gravador ligado no BattleManager (battle.recorder): o battleLoop chama begin, a cada ação o
+# requestMove chama action, e no fim end. Só as batalhas sorteadas pelo begin pagam alguma coisa
+#
+# filename: log no disco (o índice vai em filename + ".idx"). None: guarda na memória até o collect
+#           (processos trabalhadores, o principal junta tudo com o merge)
+# every: grava 1 de cada every batalhas (um contador, não mexe no random das batalhas)
+# outcomes: só guarda batalhas com esses resultados, ex: (-1, 0) derrotas e empates
+# resume_at: continua um log existente, descartando as batalhas das gerações >= resume_at
+class BattleRecorder:
+    def __init__(self, filename=None, every=1, outcomes=None, resume_at=None):
+        if every < 1:
+            raise ValueError(f"every precisa ser pelo menos 1, recebeu {every}")
+        self.filename = filename
+        self.every = every
+        self.outcomes = None if outcomes is None else frozenset(outcomes)
+        self.generation = -1 # Geração das próximas batalhas (-1 = desconhecida)
+        self.seen = 0 # Batalhas que passaram pelo begin
+        self.recorded = 0 # Batalhas guardadas
+        self.heads = [] # (Turno, Quem agiu, Golpe, Alvos, Super efetivo, Pouco efetivo, Inteiro) de cada registro da batalha atual
+        self.amounts = [] # Valor aplicado em cada slot, de cada registro da batalha atual
+        self.states = [] # HP, SP, MP de cada personagem, de cada registro da batalha atual
+        self.pending = [] # (Registros, Entrada) das batalhas que ainda não foram pro disco
+        self.written = 0 # Registros já no log
+        self.turns_saved = 0 # battle.turns_saved no começo da batalha atual (mudou no fim = ciclo pulado)
+        self.log = None
+        self.index = None
+        if filename is not None:
+            self._open(resume_at)
+
+    def _open(self, resume_at):
+        index_file = self.filename + ".idx"
+        if resume_at is not None and os.path.exists(self.filename) and os.path.exists(index_file):
+            entries = _read_index(index_file)
+            kept = int(np.searchsorted(entries["generation"], resume_at)) # O índice cresce em ordem de geração
+            self.written = int(entries["offset"][kept - 1] + entries["count"][kept - 1]) if kept else 0
+            with open(self.filename, "rb") as f:
+                _check_header(f.read(HEADER_SIZE), MAGIC, RECORD, self.filename)
+            self.log = open(self.filename, "r+b")
+            self.log.truncate(HEADER_SIZE + self.written * RECORD.itemsize)
+            self.log.seek(0, os.SEEK_END)
+            self.index = open(index_file, "r+b")
+            self.index.truncate(HEADER_SIZE + kept * INDEX.itemsize)
+            self.index.seek(0, os.SEEK_END)
+        else:
+            self.log = open(self.filename, "wb")
+            self.log.write(_header(MAGIC, RECORD.itemsize))
+            self.index = open(index_file, "wb")
+            self.index.write(_header(INDEX_MAGIC, INDEX.itemsize))
+
+    # Começo da batalha (personagens já inscritos): decide se ela vai ser gravada
+    def begin(self, battle):
+        self.seen += 1
+        if (self.seen - 1) % self.every: return False
+        self.heads = []
+        self.amounts = []
+        self.states = []
+        self.turns_saved = battle.turns_saved
+        self._snapshot(battle, NO_ACTOR, NO_ACTOR, 0, ZERO_AMOUNTS)
+        return True
+
+    # Só junta os números em listas, o array de registros é montado no end
+    def _snapshot(self, battle, actor, move, mask, amounts, strong=0, weak=0, whole=0):
+        self.heads.append((battle.turn, actor, move, mask, strong, weak, whole))
+        self.amounts.append(amounts)
+        self.states.append([(c.curHP, c.curSP, c.curMP) for c in battle.charList])
+
+    # Uma ação: quem agiu, o golpe, os alvos e o valor aplicado em cada um (retorno do applyMove)
+    # Também marca os alvos em que o golpe foi super ou pouco efetivo e os valores inteiros,
+    # para o replay escrever as mesmas linhas do modo verbose
+    def action(self, battle, actor, move, targets, results):
+        amounts = [0.0] * SLOTS
+        mask = strong = weak = whole = 0
+        _, _, _, target_kind, _, element, _ = MOVE_ROWS[move]
+        for target, value in zip(targets, results):
+            amounts[target] = value
+            mask |= 1 << target
+            if type(value) is int: whole |= 1 << target
+            if target_kind != 1: # Golpes no próprio usuário não têm matchup
+                mult = TYPE_MULT[element][battle.charList[target].stats["BaseElement"]]
+                if mult > 1.0: strong |= 1 << target
+                elif mult < 1.0: weak |= 1 << target
+        self._snapshot(battle, actor, move, mask, amounts, strong, weak, whole)
+
+    # Fim da batalha com o resultado do battleLoop (Resultado, Dano, HP máximo dos inimigos, Cura)
+    def end(self, battle, result):
+        outcome, damage, _, healed = result
+        if self.outcomes is not None and outcome not in self.outcomes:
+            return
+        # A detecção de ciclos pulou turnos: guarda o estado final depois do salto
+        if battle.turns_saved != self.turns_saved:
+            self._snapshot(battle, NO_ACTOR, NO_ACTOR, 0, ZERO_AMOUNTS)
+
+        chars = battle.charList
+        count = len(self.heads)
+        records = np.zeros(count, dtype=RECORD)
+        heads = np.array(self.heads, dtype=np.int64)
+        states = np.array(self.states, dtype=np.float32) # (Registros, Personagens, HP/SP/MP)
+        records["turn"] = heads[:, 0]
+        records["actor"] = heads[:, 1]
+        records["move"] = heads[:, 2]
+        records["targets"] = heads[:, 3]
+        records["strong"] = heads[:, 4]
+        records["weak"] = heads[:, 5]
+        records["whole"] = heads[:, 6]
+        records["amount"] = self.amounts
+        records["hp"][:, :len(chars)] = states[:, :, 0]
+        records["sp"][:, :len(chars)] = states[:, :, 1]
+        records["mp"][:, :len(chars)] = states[:, :, 2]
+
+        entry = np.zeros(1, dtype=INDEX)
+        entry["count"] = count
+        entry["generation"] = self.generation
+        entry["genome"] = genome_crc(battle.active_genome) if battle.active_genome is not None else 0
+        entry["outcome"] = outcome
+        entry["slots"] = len(chars)
+        entry["turns"] = battle.turn
+        entry["types"] = [c.typeID for c in chars] + [-1] * (SLOTS - len(chars))
+        entry["max_hp"] = [c.stats["HP"] for c in chars] + [0.0] * (SLOTS - len(chars))
+        entry["damage"] = damage
+        entry["healed"] = healed
+        self._append(records, entry)
+
+    def _append(self, records, entry):
+        self.pending.append((records, entry))
+        self.recorded += 1
+        if self.log is not None and len(self.pending) >= FLUSH_BATTLES:
+            self.flush()
+
+    # Batalhas guardadas na memória desde a última chamada (processos trabalhadores)
+    def collect(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+    # Junta as batalhas de um trabalhador, marcadas com a geração atual deste gravador
+    def merge(self, pending):
+        for records, entry in pending:
+            entry["generation"] = self.generation
+            self._append(records, entry)
+
+    # Escreve as batalhas pendentes: todos os registros primeiro, depois as entradas do índice
+    def flush(self):
+        if self.log is None: return
+        entries = []
+        for records, entry in self.pending:
+            entry["offset"] = self.written
+            self.written += len(records)
+            self.log.write(records.tobytes())
+            entries.append(entry.tobytes())
+        self.pending = []
+        self.log.flush()
+        self.index.write(b"".join(entries))
+        self.index.flush()
+
+    def close(self):
+        if self.log is None: return
+        self.flush()
+        self.log.close()
+        self.index.close()
+        self.log = self.index = None
+
+# Leitura do log: o índice vai pra memória, os registros ficam mapeados e só a batalha pedida é lida
+class TraceLog:
+    def __init__(self, filename="battles.trace"):
+        self.filename = filename
+        self.entries = _read_index(filename + ".idx")
+        with open(filename, "rb") as f:
+            _check_header(f.read(HEADER_SIZE), MAGIC, RECORD, filename)
+        count = (os.path.getsize(filename) - HEADER_SIZE) // RECORD.itemsize
+        self.records = np.memmap(filename, dtype=RECORD, mode="r", offset=HEADER_SIZE, shape=(count,)) if count else np.zeros(0, dtype=RECORD)
+
+    def __len__(self):
+        return len(self.entries)
+
+    # (Entrada do índice, registros) da batalha n
+    def battle(self, n):
+        if not -len(self) <= n < len(self):
+            raise IndexError(f"Batalha {n} fora do registro (tem {len(self)})")
+        entry = self.entries[n]
+        offset = int(entry["offset"])
+        return entry, self.records[offset:offset + int(entry["count"])]
+
+    # Números das batalhas que passam nos filtros
+    # genomes: CRCs aceitos (veja genome_crc), outcomes: resultados aceitos
+    def select(self, outcomes=None, genomes=None, generation=None):
+        mask = np.ones(len(self), dtype=bool)
+        if outcomes is not None: mask &= np.isin(self.entries["outcome"], list(outcomes))
+        if genomes is not None: mask &= np.isin(self.entries["genome"], list(genomes))
+        if generation is not None: mask &= self.entries["generation"] == generation
+        return np.flatnonzero(mask)
+
+OUTCOME_NAMES = {-1: "Derrota", 0: "Empate", 1: "Vitória"}
+
+def _names(entry):
+    return [charSheet[int(t)]["name"] for t in entry["types"][:entry["slots"]]]
+
+# Uma linha de resumo por batalha
+def describe(n, entry):
+    foes = ", ".join(_names(entry)[1:])
+    generation = int(entry["generation"])
+    return (f"#{n:<6} Gen {generation if generation >= 0 else '?':<5} Genoma {int(entry['genome']):08x} | "
+            f"{OUTCOME_NAMES.get(int(entry['outcome']), '?'):<8} em {int(entry['turns'])} turnos | "
+            f"Dano {entry['damage']:.0f} | Cura {entry['healed']:.0f} | {foes}")
+
+# Tela de um turno no mesmo formato do print_status do BattleManager (só os vivos)
+def format_status(turn, names, hp, max_hp):
+    rows = [(name, i == 0, float(cur), top) for i, (name, cur, top) in enumerate(zip(names, hp, max_hp)) if cur > 0]
+    return BattleManager.formatStatus(turn, rows) # O herói é sempre o primeiro inscrito
+
+# Mostra a batalha n do log como o modo verbose mostraria, sem simular nada
+# delay: pausa entre os turnos em segundos (0 = tudo de uma vez)
+# start_turn: avança direto até este turno, sem pausas
+def render_battle(log, n, delay=REPLAY_DELAY, start_turn=0, out=sys.stdout):
+    entry, records = log.battle(n)
+    names = _names(entry)
+    slots = int(entry["slots"])
+    max_hp = [int(x) if float(x).is_integer() else float(x) for x in entry["max_hp"][:slots]]
+    out.write(describe(n % len(log), entry) + "\n")
+
+    prev = records[0]
+    for record in records[1:]:
+        turn = int(record["turn"])
+        if record["actor"] == NO_ACTOR: # Ciclo pulado
+            out.write(f"(Ciclo detectado no turno {int(prev['turn'])}, a batalha pula para o turno {turn})\n")
+            prev = record
+            continue
+        actor = int(record["actor"])
+        move = moveSheet[int(record["move"])]
+        if turn >= start_turn:
+            out.write(format_status(turn, names, prev["hp"][:slots], max_hp) + "\n")
+            if not record["targets"]: # Vez perdida, o golpe não foi usado
+                out.write(f"[WARN] {names[actor]} não tem alvos.\n")
+            for target in range(slots):
+                if not record["targets"] >> target & 1: continue
+                bit = 1 << target
+                amount = float(record["amount"][target])
+                amount = int(amount) if record["whole"] & bit else round(amount, 4) # float32 -> o número que o verbose escreveu
+                if move["Target"] == 1:
+                    out.write(f"{names[actor]} usou {move['name']} e recuperou {amount} HP\n")
+                else:
+                    eff_text = "(Super Efetivo!)" if record["strong"] & bit else "(Pouco Efetivo...)" if record["weak"] & bit else ""
+                    out.write(f"{names[actor]} usou {move['name']} em {names[target]} >> {amount} dmg {eff_text}\n")
+        if turn >= start_turn and delay > 0:
+            out.flush()
+            time.sleep(delay)
+        prev = record
+
+    out.write(format_status(int(entry["turns"]), names, prev["hp"][:slots], max_hp) + "\n")
+    out.write(f"Resultado: {OUTCOME_NAMES.get(int(entry['outcome']), '?')}\n")
+
+if __name__ == "__main__":
+    # Resumo rápido do log: python battlelog.py battles.trace
+    log = TraceLog(sys.argv[1] if len(sys.argv) > 1 else "battles.trace")
+    outcomes = log.entries["outcome"]
+    print(f"Batalhas: {len(log)} | Registros: {len(log.records)} | "
+          f"Vitórias {np.sum(outcomes == 1)} | Empates {np.sum(outcomes == 0)} | Derrotas {np.sum(outcomes == -1)}")
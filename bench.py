@@ -0,0 +1,207 @@
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import numpy as np # type: ignore
+
+from classes import *
+from replay import load_champion
+
+# Benchmarks dos caminhos quentes da simulação
+# Mede operações por segundo (maior é melhor) com seeds fixas, então duas rodadas fazem exatamente o mesmo trabalho
+# Grava o resultado em JSON e compara com um baseline salvo, marcando o que ficou mais lento que o limite
+#
+#   python bench.py --save-baseline     # Mede e guarda como referência
+#   python bench.py                     # Mede e compara com a referência (sai com código 1 se algo regrediu)
+#   python bench.py --check-trace       # Confere se o TRACE grava as mesmas batalhas com vários processos
+
+BASELINE_FILE = "bench_baseline.json"
+THRESHOLD = 0.10 # Queda relativa máxima antes de marcar como regressão
+REPEAT = 5 # Cada medida roda REPEAT vezes e fica com a melhor (menos ruído do sistema)
+
+SWARM = [1, 2, 3] # Encontro com o máximo de inimigos comuns
+
+# Melhor tempo de REPEAT execuções de fn, convertido em operações por segundo
+def measure(fn, ops, repeat=REPEAT):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return ops / best
+
+# Batalha montada (herói + inimigos) para tirar o estado de um turno real
+def arena(genome, foes):
+    battle = BattleManager()
+    battle.active_genome = genome # type: ignore
+    battle.addHeroes(0)
+    for foeID in foes:
+        battle.addFoes(foeID)
+    return battle
+
+# Candidatos (Golpe, Alvo) do herói num turno real, como o getMove monta
+def hero_turn(genome, foes):
+    battle = arena(genome, foes)
+    hero = battle.charList[0]
+    situation = battle.getBattleStatus()
+    me, _, cand_ids, cand_targets = CombatAlgorithms.heroCandidates(hero.ID, True, situation, hero.getMoveList())
+    return me, cand_targets, cand_ids, situation
+
+# Forward pass de um turno inteiro no cérebro compilado (o mesmo do getMove)
+def bench_predict_many(genome, calls=20000):
+    brain = AIBrain.compile(genome)
+    inputs = CombatAlgorithms.get_turn_inputs(*hero_turn(genome, SWARM))
+    def run():
+        for _ in range(calls): brain.predict_many(inputs)
+    return measure(run, calls)
+
+def bench_turn_inputs(genome, calls=20000):
+    args = hero_turn(genome, SWARM)
+    def run():
+        for _ in range(calls): CombatAlgorithms.get_turn_inputs(*args)
+    return measure(run, calls)
+
+def bench_get_move(genome, calls=5000):
+    battle = arena(genome, SWARM)
+    hero = battle.charList[0]
+    situation = battle.getBattleStatus()
+    moveList = hero.getMoveList()
+    def run():
+        for _ in range(calls): CombatAlgorithms.getMove(hero.ID, True, situation, moveList, brain=hero.brain)
+    return measure(run, calls)
+
+# encounter: encontro fixo, ou None para sortear com seed fixa
+def bench_battles(genome, encounter=None, battles=300):
+    battle = BattleManager()
+    battle.active_genome = genome # type: ignore
+    def run():
+        random.seed(0)
+        for _ in range(battles):
+            battle.cleanup()
+            battle.battleLoop(encounter)
+    return measure(run, battles)
+
+# Treino pequeno com seed fixa, sem checkpoint, arquivo de linhagem nem gráfico
+SMALL_TRAIN = {"POPULATION_SIZE": 20, "NUM_TESTS": 5, "WORKERS": 1, "CHECKPOINT_EVERY": 0,
+               "ARCHIVE": False, "PLOT_AT_END": False, "MASTER_SEED": 0}
+
+# Roda fn(train) com os parâmetros de config numa pasta temporária (não mexe no campeão salvo)
+# e devolve os parâmetros originais do train.py no fim
+def with_train(config, fn):
+    import train
+    saved = {k: getattr(train, k) for k in config}
+    for k, v in config.items(): setattr(train, k, v)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            return fn(train)
+    finally:
+        os.chdir(cwd)
+        for k, v in saved.items(): setattr(train, k, v)
+
+# Gerações por segundo de um treino pequeno
+def bench_train(generations=5, dtype="float64"):
+    def run_all(train):
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                train.train()
+        return measure(run, generations, repeat=max(1, REPEAT // 2))
+    return with_train({**SMALL_TRAIN, "GENERATIONS": generations, "GENOME_DTYPE": dtype}, run_all)
+
+# Bytes do registro de batalhas (log e índice) de um treino pequeno com TRACE
+def train_trace(workers, generations=3, every=7):
+    def run(train):
+        with contextlib.redirect_stdout(io.StringIO()):
+            train.train()
+        with open(train.TRACE_FILE, "rb") as f, open(train.TRACE_FILE + ".idx", "rb") as idx:
+            return f.read(), idx.read()
+    config = {**SMALL_TRAIN, "GENERATIONS": generations, "WORKERS": workers, "ENGINE": "object",
+              "TRACE": True, "TRACE_EVERY": every, "TRACE_OUTCOMES": None}
+    return with_train(config, run)
+
+# Confere se o treino com vários processos grava exatamente as mesmas batalhas que com um só
+def check_trace(workers=3):
+    expected = train_trace(1)
+    for n in (workers, workers): # Duas vezes: quem pega cada pedaço muda de uma rodada pra outra
+        if train_trace(n) != expected:
+            print(f"Registro de batalhas com {n} processos diferente do de 1 processo")
+            return False
+    print(f"Registro de batalhas igual com 1 e {workers} processos ({len(expected[0])} bytes)")
+    return True
+
+def run_benchmarks(champion_file=None):
+    champion = load_champion(champion_file)
+    rng = np.random.RandomState(0)
+    rand_genome = rng.uniform(-1, 1, len(champion))
+
+    results = {}
+    def record(name, fn, *args):
+        results[name] = fn(*args)
+        print(f"{name:<28} {results[name]:>12.1f} /s")
+
+    record("predict_many", bench_predict_many, champion)
+    record("predict_many_float32", bench_predict_many, champion.astype(np.float32))
+    record("get_turn_inputs", bench_turn_inputs, champion)
+    record("getMove", bench_get_move, champion)
+    record("battleLoop_champion", bench_battles, champion)
+    record("battleLoop_random", bench_battles, rand_genome)
+    record("battleLoop_boss", bench_battles, champion, [BOSS_ID], 100)
+    record("battleLoop_swarm", bench_battles, champion, SWARM)
+    record("train_generations", bench_train)
+    record("train_generations_float32", bench_train, 5, "float32")
+    return results
+
+# Compara com o baseline, retorna os nomes das medidas que regrediram além do limite
+def compare(results, baseline, threshold=THRESHOLD):
+    regressions = []
+    print(f"\n{'Medida':<28} {'Baseline':>12} {'Atual':>12} {'Variação':>9}")
+    for name, value in results.items():
+        if name not in baseline:
+            print(f"{name:<28} {'-':>12} {value:>12.1f}      nova")
+            continue
+        change = value / baseline[name] - 1.0
+        flag = ""
+        if change < -threshold:
+            flag = "  << REGRESSÃO"
+            regressions.append(name)
+        print(f"{name:<28} {baseline[name]:>12.1f} {value:>12.1f} {change*100:>+8.1f}%{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks da simulação com comparação contra um baseline")
+    parser.add_argument("--champion", default=None, help="genoma usado nas medidas (padrão: champion.genome ou champion.json)")
+    parser.add_argument("--out", default=None, help="grava o resultado em JSON")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="arquivo de baseline")
+    parser.add_argument("--save-baseline", action="store_true", help="grava o resultado como novo baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="queda relativa que conta como regressão")
+    parser.add_argument("--check-trace", type=int, nargs="?", const=3, default=None, metavar="WORKERS",
+                        help="só confere se o TRACE grava as mesmas batalhas com WORKERS processos e com 1")
+    args = parser.parse_args()
+
+    if args.check_trace is not None:
+        sys.exit(0 if check_trace(args.check_trace) else 1)
+
+    results = run_benchmarks(args.champion)
+    if args.out is not None:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline salvo em: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} medida(s) regrediram mais de {args.threshold*100:.0f}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\nNenhuma regressão")
+    else:
+        print(f"\nSem baseline em '{args.baseline}', rode com --save-baseline para criar um")
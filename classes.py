@@ -1,8 +1,11 @@
 import numpy as np # type: ignore
-import json
 import random
+import itertools
+from collections import OrderedDict
 import time
 
+from gamedata import *
+
 # O núcleo do código
 # Está aqui o código do sistema RPG, o algoritmo procedural, e o cérebro evolutivo
 
@@ -12,57 +15,28 @@ PLAYER_OVERRIDE = False # Desativa o sistema automático
                         # Deveria ativar um sistema de controle do usuário
                         # Mas não foi implementado nesta versão
 
-# Abre o arquivo de movimentos
-with open('movelist.json', 'r') as f:
-    moveSheet = json.load(f)
-
-# Abre o arquivo de personagens
-with open('charSheet.json', 'r') as f:
-    charSheet = json.load(f)
+# Encontros
+BOSS_ID = 7 # Ifrit
+BOSS_CHANCE = 10 # 1 em cada BOSS_CHANCE batalhas é contra o Boss
+FOE_IDS = range(1, 7) # Inimigos comuns que podem ser sorteados
+MAX_FOES = 3 # Máximo de inimigos comuns por encontro
 
-# Cheat Sheet: (O que cada coisa significa)
-# Function: Ataque ou Buff
-# 0 : Attack
-# 1 : Buff
-#
-# Type: Qual o Tipo usado
-# 0: Physical
-# 1: Ranged
-# 2: Magic
-#
-# Target: Quem está sendo atingido
-# 0: Single
-# 1: Self
-# 2: Multi
-#
-# Element: Qual elemento é o ataque
-# 0 : Normal
-# 1 : Fire
-# 2 : Water
-# 3 : Plant
-# 4 : Light
-# 5 : Dark 
+# Batalhas
+TURN_LIMIT = 100 # Passou disso é empate por exaustão
+CYCLE_DETECTION = True # Encerra como empate a batalha que repete um estado (cura vs cura infinito)
+CYCLE_MIN_TURN = 20 # Só procura ciclos a partir deste turno, a maioria das batalhas acaba antes
+                    # Um ciclo nunca sai de si mesmo, então começar tarde só encontra ele alguns turnos depois
+TURN_DELAY = 1.0 # Pausa entre os turnos no modo verbose (segundos)
 
-# Matchup Elementais, (ex: Fogo é fraco contra Água)
-TYPE_CHART = {
-    (1, 3): 2.0,
-    (1, 2): 0.5,
-    (1, 1): 0.5,
-    (2, 1): 2.0,
-    (2, 3): 0.5,
-    (2, 2): 0.5,
-    (3, 2): 2.0,
-    (3, 1): 0.5,
-    (3, 3): 0.5,
-    (4, 5): 2.0,
-    (4, 4): 0.5,
-    (5, 4): 2.0,
-    (5, 5): 0.5,
-}
+# Cache dos cérebros compilados (genoma -> AIBrain), descarta os usados há mais tempo
+BRAIN_CACHE_SIZE = 512 # Maior que a população, pra geração inteira caber
+_brainCache = OrderedDict()
 
 # O cérebro responsável por fazer o genoma servir para alguma coisa
+# dtype: tipo dos pesos e das contas (padrão: o do genoma, float64 para genomas novos ou listas)
+#        com float32 os inputs também são convertidos, a rede inteira roda em precisão simples
 class AIBrain:
-    def __init__(self, genome=None, input_size=12, hidden_size=8):
+    def __init__(self, genome=None, input_size=12, hidden_size=8, dtype=None):
         # A arquitetura utilizada de 3 camadas, Input -> Hidden -> Output
         self.input_size = input_size
         self.hidden_size = hidden_size
@@ -70,134 +44,270 @@ class AIBrain:
         
         # Se não há um genoma, cria um novo
         # Utilizado pela primeira geração
+        # Pesos da camada 1 + Bias 1 + Pesos da camada 2 + Bias 2
+        n_weights = (input_size * hidden_size) + hidden_size + (hidden_size * 1) + 1
         if genome is None:
-            # Pesos da camada 1 + Bias 1 + Pesos da camada 2 + Bias 2
-            n_weights = (input_size * hidden_size) + hidden_size + (hidden_size * 1) + 1
             self.genome = np.random.uniform(-1, 1, n_weights)
         else:
             self.genome = np.array(genome)
-            
-    def predict(self, inputs):
-        # Desempacota o genoma linear em pesos de matriz
+        if dtype is not None:
+            self.genome = self.genome.astype(dtype, copy=False)
+        if self.genome.shape != (n_weights,):
+            raise ValueError(f"Genoma com formato {self.genome.shape}, esperado ({n_weights},)")
+        
+        # Desempacota o genoma linear em pesos de matriz, uma vez só
         idx1 = self.input_size * self.hidden_size
-        W1 = self.genome[0:idx1].reshape((self.input_size, self.hidden_size))
+        self.W1 = np.ascontiguousarray(self.genome[0:idx1].reshape((self.input_size, self.hidden_size)))
         
         idx2 = idx1 + self.hidden_size
-        B1 = self.genome[idx1:idx2]
+        self.B1 = np.ascontiguousarray(self.genome[idx1:idx2])
         
         idx3 = idx2 + (self.hidden_size * 1)
-        W2 = self.genome[idx2:idx3].reshape((self.hidden_size, 1))
+        self.W2 = np.ascontiguousarray(self.genome[idx2:idx3].reshape((self.hidden_size, 1)))
         
-        B2 = self.genome[idx3:]
+        self.B2 = np.ascontiguousarray(self.genome[idx3:])
         
+        # Inputs chegam em float64, só precisam ser convertidos se os pesos forem de outro tipo
+        self.cast = self.genome.dtype if self.genome.dtype != np.float64 else None
+    
+    # Retorna o cérebro já compilado de um genoma, reaproveitando do cache se já existir
+    # A chave é o conteúdo do genoma, então cópias iguais (ex: elites) dividem o mesmo cérebro
+    @classmethod
+    def compile(cls, genome):
+        genome = np.asarray(genome)
+        key = genome.tobytes()
+        brain = _brainCache.get(key)
+        if brain is not None:
+            _brainCache.move_to_end(key) # Usado agora, vai pro fim da fila
+            return brain
+        
+        brain = cls(genome=genome)
+        _brainCache[key] = brain
+        if len(_brainCache) > BRAIN_CACHE_SIZE:
+            _brainCache.popitem(last=False) # Descarta o usado há mais tempo
+        return brain
+            
+    def predict(self, inputs):
+        if self.cast is not None: inputs = np.asarray(inputs, dtype=self.cast)
         # Forward Pass
         # Camada Oculta com ativação ReLU
-        z1 = np.dot(inputs, W1) + B1
+        z1 = np.dot(inputs, self.W1) + self.B1
         a1 = np.maximum(0, z1) 
         
         # Saída Linear (pode ser negativa ou positiva)
-        output = np.dot(a1, W2) + B2
+        output = np.dot(a1, self.W2) + self.B2
         return output[0] # Retorna o float do score
+    
+    # Mesma rede, mas dá a nota de várias ações de uma vez
+    # inputs: (Candidatos, Input) -> scores: (Candidatos,)
+    def predict_many(self, inputs):
+        if self.cast is not None: inputs = inputs.astype(self.cast)
+        z1 = np.dot(inputs, self.W1) + self.B1
+        a1 = np.maximum(0, z1)
+        return (np.dot(a1, self.W2) + self.B2)[:, 0]
+
+# Vários cérebros de uma vez, a população inteira empilhada em tensores de pesos
+# W1: (P, Input, Hidden), B1: (P, Hidden), W2: (P, Hidden, 1), B2: (P, 1)
+# dtype: como no AIBrain, o padrão é o tipo dos genomas (float32 roda tudo em precisão simples)
+class PopulationBrain:
+    def __init__(self, genomes, input_size=12, hidden_size=8, dtype=None):
+        self.input_size = input_size
+        self.hidden_size = hidden_size
+        genomes = np.asarray(genomes)
+        if dtype is None and not np.issubdtype(genomes.dtype, np.floating): dtype = np.float64
+        if dtype is not None: genomes = genomes.astype(dtype, copy=False)
+        self.size = len(genomes)
+        
+        # Mesmo desempacotamento do AIBrain, mas para todos os genomas
+        idx1 = input_size * hidden_size
+        idx2 = idx1 + hidden_size
+        idx3 = idx2 + (hidden_size * 1)
+        self.W1 = genomes[:, 0:idx1].reshape((self.size, input_size, hidden_size))
+        self.B1 = genomes[:, idx1:idx2]
+        self.W2 = genomes[:, idx2:idx3].reshape((self.size, hidden_size, 1))
+        self.B2 = genomes[:, idx3:]
+    
+    # Dá a nota de C ações candidatas para cada indivíduo de uma vez
+    # inputs: (P, C, Input) -> scores: (P, C)
+    # members: quais indivíduos são donos de cada linha dos inputs (padrão: todos, em ordem)
+    def predict(self, inputs, members=None):
+        if members is None:
+            W1, B1, W2, B2 = self.W1, self.B1, self.W2, self.B2
+        else:
+            W1, B1, W2, B2 = self.W1[members], self.B1[members], self.W2[members], self.B2[members]
+        if inputs.dtype != W1.dtype: inputs = inputs.astype(W1.dtype)
+        
+        # Forward Pass, Camada Oculta com ativação ReLU
+        z1 = np.matmul(inputs, W1) + B1[:, None, :]
+        a1 = np.maximum(0, z1)
+        
+        # Saída Linear
+        return np.matmul(a1, W2)[:, :, 0] + B2
+    
+# Estado vivo da batalha: a lista de status (dicts) de cada personagem, na ordem do charList
+# Os próprios Characters atualizam seus dicts no lugar (addHP, addSP, addMP...), então nada é remontado por turno
+# As listas de vivos de cada lado ficam em cache e só são invalidadas quando alguém morre (ou revive)
+# Também guarda a contagem de vivos de cada lado e o anel de turnos: uma lista ligada circular
+# (ringNext/ringPrev, indexada pelo battleID) só com os vivos. Quem morre sai do anel mas
+# mantém o ringNext, então seguir a corrente a partir de um morto chega no próximo vivo
+class BattleState(list):
+    __slots__ = ("_alive", "aliveCount", "ringNext", "ringPrev")
+    
+    def __init__(self, combatants=()):
+        super().__init__(combatants)
+        self._alive = {}
+        self.relink()
+    
+    # Recalcula contagens e o anel do zero (ao inscrever alguém ou se alguém reviver)
+    def relink(self):
+        self._alive.clear()
+        self.aliveCount = {True: 0, False: 0}
+        n = len(self)
+        self.ringNext = list(range(n))
+        self.ringPrev = list(range(n))
+        living = [i for i in range(n) if self[i]['isAlive']]
+        for i in living:
+            self.aliveCount[self[i]['isHero']] += 1
+        if not living: return
+        for k, i in enumerate(living):
+            self.ringNext[i] = living[(k + 1) % len(living)]
+            self.ringPrev[i] = living[k - 1]
+        # Mortos apontam para o próximo vivo depois deles
+        for i in range(n):
+            if not self[i]['isAlive']:
+                j = (i + 1) % n
+                while not self[j]['isAlive']: j = (j + 1) % n
+                self.ringNext[i] = j
+    
+    # Tira o personagem do anel e da contagem do seu lado
+    def died(self, battleID):
+        self._alive.clear()
+        self.aliveCount[self[battleID]['isHero']] -= 1
+        prev = self.ringPrev[battleID]
+        nxt = self.ringNext[battleID]
+        self.ringNext[prev] = nxt
+        self.ringPrev[nxt] = prev
+    
+    # Primeiro vivo a partir da posição pos (ela mesma, se estiver viva)
+    def nextActor(self, pos):
+        while not self[pos]['isAlive']:
+            pos = self.ringNext[pos]
+        return pos
+    
+    # Status dos personagens vivos de um lado (isHero True/False)
+    def alive(self, isHero):
+        side = self._alive.get(isHero)
+        if side is None:
+            side = [x for x in self if x['isHero'] == isHero and x['isAlive']]
+            self._alive[isHero] = side
+        return side
+    
+    # Vivos de um lado, para um BattleState (com cache) ou uma lista simples de dicts
+    @staticmethod
+    def aliveIn(situation, isHero):
+        if isinstance(situation, BattleState):
+            return situation.alive(isHero)
+        return [x for x in situation if x['isHero'] == isHero and x['isAlive']]
 
 # Sistema estático responsável por fornecer qual ataque deve ser usado e e em quem
 class CombatAlgorithms:
     # Retorna o melhor move e os alvos que pode ser utilizado, de acordo com o algoritmo utilizado
     @classmethod
-    def getMove(cls, ID, isHero, situation, moveList, current_genome=None):
+    # brain: cérebro já compilado, se não for passado compila (ou pega do cache) a partir do current_genome
+    def getMove(cls, ID, isHero, situation, moveList, current_genome=None, brain=None):
         # Se é um inimigo, usa o algoritmo procedural
         if isHero == False:
             return cls.dumbProceduralAttack(ID, isHero, situation, moveList)
         # Se é o herói e tem um genoma, usa o sistema evolutivo
-        if PLAYER_OVERRIDE == False and current_genome is not None:
+        if PLAYER_OVERRIDE == False and (brain is not None or current_genome is not None):
             # Ativa o cerebro
-            brain = AIBrain(genome=current_genome)
+            if brain is None: brain = AIBrain.compile(current_genome)
             
-            best_score = -99999
-            best_move = moveList[0]
-            best_targets = []
+            me, enemies, cand_ids, cand_targets = cls.heroCandidates(ID, isHero, situation, moveList)
+            if not cand_ids: return moveList[0], []
             
-            # Obter os status do héroi (me)
-            me = next(x for x in situation if x['battleID'] == ID)
+            # O cérebro avalia todos os pares (Golpe, Alvo) em um único forward pass
+            inputs = cls.get_turn_inputs(me, cand_targets, cand_ids, situation)
+            scores = brain.predict_many(inputs)
             
-            # Iterar sobre cada golpe possível
-            for move_id in moveList:
-                move_data = moveSheet[move_id] # Puxando do JSON global
-                possible_targets = []
-                
-                # Definir quem são os alvos válidos para este golpe
-                if move_data['Target'] == 1: # Self
-                    possible_targets = [me]
-                elif move_data['Target'] == 2: # AoE (Todos inimigos)
-                    # No AoE, considera o "alvo principal" como o primeiro inimigo vivo só pra gerar input
-                    enemies = [x for x in situation if x['isHero'] != isHero and x['isAlive']]
-                    if not enemies: continue
-                    possible_targets = [enemies[0]] # Simplificação: Avalia o AoE baseado no primeiro inimigo
-                else: # Single Target (Inimigos)
-                    possible_targets = [x for x in situation if x['isHero'] != isHero and x['isAlive']]
-                
-                # O cérebro avalia cada par (Golpe, Alvo)
-                for target in possible_targets:
-                    # Gera os inputs
-                    inputs = cls.get_action_inputs(me, target, move_data, situation)
-                    
-                    # Cérebro dá a nota
-                    score = brain.predict(inputs)
-
-                    ## OBS: Injeção procedural de teste, não é uma escolha evolutiva
-                    # if inputs[0] > 0.7 and inputs[6] == 1.0: # Se está quase morto e decidiu curar
-                    #     score += 2.0 # Boost de cura crítica, feedback positivo pela escolha
-                        
-                    if score > best_score:
-                        best_score = score
-                        best_move = move_id
-                        
-                        # Definir a lista final de alvos baseada no tipo
-                        if move_data['Target'] == 2:
-                             # Se escolheu AoE, pega todos IDs de inimigos vivos
-                             all_enemies = [x['battleID'] for x in situation if x['isHero'] != isHero and x['isAlive']]
-                             best_targets = all_enemies
-                        else:
-                             best_targets = [target['battleID']]
+            ## OBS: Injeção procedural de teste, não é uma escolha evolutiva
+            # scores[(inputs[:, 0] > 0.7) & (inputs[:, 6] == 1.0)] += 2.0 # Boost de cura crítica
             
-            return best_move, best_targets
+            return cls.pickCandidate(scores, cand_ids, cand_targets, enemies, moveList)
         
         # Fallback se não tiver genoma ou for player manual (não implementado ainda)
         else:    
             return cls.dumbProceduralAttack(ID, isHero, situation, moveList)
         
+    # Lista todos os pares (Golpe, Alvo) possíveis para o herói, na mesma ordem de avaliação
+    # Retorna os status do herói (me), os inimigos vivos e os candidatos (ids dos golpes, status dos alvos)
+    @staticmethod
+    def heroCandidates(ID, isHero, situation, moveList):
+        # Obter os status do héroi (me) e dos inimigos vivos
+        me = next(x for x in situation if x['battleID'] == ID)
+        enemies = BattleState.aliveIn(situation, not isHero)
+        
+        cand_ids = []
+        cand_targets = []
+        for move_id in moveList:
+            target_kind = MOVE_ROWS[move_id][3] # Puxando da tabela compilada
+            
+            # Definir quem são os alvos válidos para este golpe
+            if target_kind == 1: # Self
+                possible_targets = [me]
+            elif target_kind == 2: # AoE (Todos inimigos)
+                # No AoE, considera o "alvo principal" como o primeiro inimigo vivo só pra gerar input
+                if not enemies: continue
+                possible_targets = [enemies[0]] # Simplificação: Avalia o AoE baseado no primeiro inimigo
+            else: # Single Target (Inimigos)
+                possible_targets = enemies
+            
+            for target in possible_targets:
+                cand_ids.append(move_id)
+                cand_targets.append(target)
+        return me, enemies, cand_ids, cand_targets
+    
+    # Escolhe o golpe e os alvos a partir das notas do cérebro para cada candidato
+    @staticmethod
+    def pickCandidate(scores, cand_ids, cand_targets, enemies, moveList):
+        # argmax pega o primeiro maior, mesmo desempate do antigo "score > best_score"
+        best = int(np.argmax(scores))
+        if not scores[best] > -99999:
+            return moveList[0], []
+        best_move = cand_ids[best]
+        
+        # Definir a lista final de alvos baseada no tipo
+        if MOVE_IS_AOE[best_move]:
+            # Se escolheu AoE, pega todos IDs de inimigos vivos
+            return best_move, [x['battleID'] for x in enemies]
+        return best_move, [cand_targets[best]['battleID']]
+    
     # Retorna o multiplicador do matchup elemental
     @staticmethod
     def getMultiplier(atkElem, defElem):
-        return TYPE_CHART.get((atkElem, defElem), 1.0)
+        return TYPE_MULT[atkElem][defElem]
 
     # Algoritmo procedural que pega o alvo com menos vida e usa o golpe disponível mais forte nele
     @staticmethod
     def dumbProceduralAttack(ID, isHero, situation, moveList):
-        strongestMove = 0
-        bestPower = -1
         # Ignora matchups e acha "o maior porrete", mesmo que seja pior que outra opção
-        for x in moveList:
-            if moveSheet[x]["BasePower"] > bestPower and moveSheet[x]["Target"] != 1:
-                strongestMove = x
-                bestPower = moveSheet[x]["BasePower"]
+        # max fica com o primeiro em caso de empate; sem nenhum ataque usa o move 0
+        strongestMove = max(moveList, key=ATTACK_POWER.__getitem__)
+        if ATTACK_POWER[strongestMove] < 0: strongestMove = 0
         
         # Se o melhor ataque é um MultiTarget
-        if moveSheet[strongestMove]["Target"] == 2:
-            enemyList = []
-            for x in situation:
-                if x["isHero"] != isHero and x["isAlive"]:
-                    enemyList.append(x["battleID"])
+        enemies = BattleState.aliveIn(situation, not isHero)
+        if MOVE_IS_AOE[strongestMove]:
             # Não precisa decidir se vai todo mundo apanhar
-            return strongestMove, enemyList
+            return strongestMove, [x["battleID"] for x in enemies]
 
         # Pega o inimigo com a menor vida (absoluta, não relativa)
         weakestEnemy = -1
         lowestHP = 9999999
-        for x in situation:
-            if x["isHero"] != isHero and x["isAlive"]:
-                if x["HP"] < lowestHP:
-                    weakestEnemy = x["battleID"]
-                    lowestHP = x["HP"]
+        for x in enemies:
+            if x["HP"] < lowestHP:
+                weakestEnemy = x["battleID"]
+                lowestHP = x["HP"]
         return strongestMove, [weakestEnemy]
   
     # Retorna a situação de combate atual
@@ -257,9 +367,37 @@ class CombatAlgorithms:
         
         return inputs
     
+    # Mesmos inputs do get_action_inputs, para vários pares (Golpe, Alvo) do mesmo turno
+    # Os inputs do turno (dor, SP, caos, densidade) são calculados uma vez só
+    # e os do golpe vem prontos da tabela MOVE_FEATURES
+    @staticmethod
+    def get_turn_inputs(attacker_stats, targets, move_ids, situation):
+        inputs = np.empty((len(move_ids), 12))
+        
+        # Inputs do turno, iguais para todos os candidatos
+        raw_hp = attacker_stats['HP'] / attacker_stats['MaxHP']
+        inputs[:, 0] = min(1.0, 1.0 - raw_hp)
+        inputs[:, 1] = min(1.0, attacker_stats['SP'] / attacker_stats['MaxSP'])
+        inputs[:, 10] = len(situation) / 4.0
+        inputs[:, 11] = len(BattleState.aliveIn(situation, False)) / 3.0
+        
+        # Inputs do alvo de cada candidato
+        tgt_hp = np.array([t['HP'] for t in targets], dtype=np.float64)
+        tgt_max_hp = np.array([t['MaxHP'] for t in targets], dtype=np.float64)
+        tgt_elem = [t['Element'] for t in targets]
+        inputs[:, 2] = np.minimum(1.0, tgt_hp / tgt_max_hp)
+        inputs[:, 3] = np.minimum(1.0, tgt_max_hp / 1000.0)
+        inputs[:, 4] = [1.0 if attacker_stats['battleID'] == t['battleID'] else 0.0 for t in targets]
+        
+        # Inputs do golpe (Custo, Poder, É cura, É área) e a vantagem elemental
+        inputs[:, 5:9] = MOVE_FEATURES[move_ids]
+        inputs[:, 9] = ADVANTAGE[MOVE_ELEM[move_ids], tgt_elem]
+        
+        return inputs
+    
 # Estrutura de personagem, utilizada para cada ator ativo no combate
 class Character:
-    def __init__(self, name, typeID, ID, hero, statSheet = None, moveList = [], genome=None):
+    def __init__(self, name, typeID, ID, hero, statSheet = None, moveList = [], genome=None, brain=None):
         self.ID = ID
         self.name = name
         self.typeID = typeID
@@ -270,7 +408,23 @@ class Character:
         self.curSP = 0.5 * self.stats["SP"]
         self.curMP = self.stats["MP"]
         self.moveList = moveList
+        self.moveCosts = moveCosts(moveList) # (Move, Custo SP, Custo MP) de cada move
         self.genome = genome
+        self.brain = brain # Cérebro compilado do genoma (só o herói tem)
+        self.state = None # BattleState em que está inscrito, avisado quando morre ou revive
+        # Status exportado, atualizado no lugar a cada mudança de HP/SP/MP
+        self.status = {
+            "battleID" : self.ID,
+            "typeID" : self.typeID,
+            "isHero" : self.isHero,
+            "Element" : self.stats["BaseElement"],
+            "isAlive" : self.isAlive,
+            "HP": self.curHP,
+            "MaxHP": self.stats["HP"],
+            "SP": self.curSP,
+            "MaxSP": self.stats["SP"],
+            "MP": self.curMP,
+        }
         
     def _setBaseStats(self, statSheet = None):
         if statSheet == None:
@@ -288,25 +442,36 @@ class Character:
             return exStatSheet
         return statSheet
     
+    # Espelha o isAlive no status e avisa o BattleState (só muda na morte ou ao reviver)
+    def _setAlive(self, alive):
+        if alive != self.isAlive:
+            self.isAlive = alive
+            self.status["isAlive"] = alive
+            if self.state is None: return
+            if alive: self.state.relink()
+            else: self.state.died(self.ID)
+    
     def setHP(self, value):
         self.curHP = value
         if self.curHP < 0:
             self.curHP = 0
         if self.curHP > 0:
-            self.isAlive = True
+            self._setAlive(True)
         if self.curHP > self.stats["HP"]:
             self.curHP = self.stats["HP"]
+        self.status["HP"] = self.curHP
         
     def addHP(self, value):
         preHP = self.curHP
         if self.curHP > 0:
             self.curHP += value
         if self.curHP <= 0:
-            self.isAlive = False
+            self._setAlive(False)
             self.curHP = 0
         if self.curHP > self.stats["HP"]:
             self.curHP = self.stats["HP"]
         postHP = self.curHP
+        self.status["HP"] = postHP
         return postHP-preHP
             
     def setMP(self, value):
@@ -314,9 +479,10 @@ class Character:
         if self.curMP < 0:
             self.curMP = 0
         if self.curMP > 0:
-            self.isAlive = True
+            self._setAlive(True)
         if self.curMP > self.stats["MP"]:
             self.curMP = self.stats["MP"]
+        self.status["MP"] = self.curMP
         
     def addMP(self, value):
         if self.curMP > 0:
@@ -325,15 +491,18 @@ class Character:
             self.curMP = 0
         if self.curMP > self.stats["MP"]:
             self.curHP = self.stats["MP"]
+            self.status["HP"] = self.curHP
+        self.status["MP"] = self.curMP
             
     def setSP(self, value):
         self.curSP = value
         if self.curSP < 0:
             self.curSP = 0
         if self.curSP > 0:
-            self.isAlive = True
+            self._setAlive(True)
         if self.curSP > self.stats["SP"]:
             self.curSP = self.stats["SP"]
+        self.status["SP"] = self.curSP
         
     def addSP(self, value):
         if self.curSP > 0:
@@ -342,41 +511,34 @@ class Character:
             self.curSP = 0
         if self.curSP > self.stats["SP"]:
             self.curSP = self.stats["SP"]
+        self.status["SP"] = self.curSP
             
     def addMove(self, moveID):
         if moveID not in self.moveList:
             self.moveList.append(moveID)
+            self.moveCosts = moveCosts(self.moveList)
         else:
             print(f"[WARN]: Move {moveID} already exists for character {self.ID}")
 
     # Retorna os moves possíveis de acordo com o custo de SP e MP.
     def getMoveList(self):
-        possibleMoves = []
-        for move in self.moveList:
-            if moveSheet[move]["SPCost"] <= self.curSP and moveSheet[move]["MPCost"] <= self.curMP:
-                possibleMoves.append(move)
-        return possibleMoves
+        # Tuplas pré-compiladas: com 2 a 7 moves o loop simples é mais rápido que uma comparação do NumPy
+        return [move for move, spCost, mpCost in self.moveCosts if spCost <= self.curSP and mpCost <= self.curMP]
     
     # Wrapper para todo gerenciamento de movimento
     def act(self, situation = []):
         moveList = self.getMoveList()
-        return CombatAlgorithms.getMove(self.ID, self.isHero, situation, moveList, self.genome)
+        return CombatAlgorithms.getMove(self.ID, self.isHero, situation, moveList, self.genome, self.brain)
+
+    # Volta HP/SP/MP para valores já vistos na mesma batalha (não mexe em quem está vivo)
+    def restore(self, hp, sp, mp):
+        self.curHP = self.status["HP"] = hp
+        self.curSP = self.status["SP"] = sp
+        self.curMP = self.status["MP"] = mp
 
-    # Retorna um dict simples de stats
+    # Retorna um dict simples de stats (cópia do status vivo, não muda depois)
     def dumpStats(self):
-        exportStats = {
-            "battleID" : self.ID,
-            "typeID" : self.typeID,
-            "isHero" : self.isHero,
-            "Element" : self.stats["BaseElement"],
-            "isAlive" : self.isAlive,
-            "HP": self.curHP,
-            "MaxHP": self.stats["HP"],
-            "SP": self.curSP,
-            "MaxSP": self.stats["SP"],
-            "MP": self.curMP,
-        }
-        return exportStats
+        return dict(self.status)
 
 # Gerenciador de batalhas e o sistema RPG
 class BattleManager:
@@ -392,13 +554,27 @@ class BattleManager:
         self.total_damage_dealt = 0
         self.verbose = verbose
         self.total_healed = 0
+        self.state = BattleState()
+        self.ledger = [] # (É dano, Valor) de cada soma no dano/cura do herói, em ordem
+        self.turns_saved = 0 # Turnos pulados pela detecção de ciclos (acumulado, o cleanup não zera)
+        self.turn_delay = TURN_DELAY
+        self.recorder = None # Gravador de batalhas (battlelog.BattleRecorder), None = desligado
+        self.tracing = False # A batalha atual está sendo gravada
+    
+    # Inscreve o personagem no estado vivo da batalha
+    def _register(self, char):
+        char.state = self.state
+        self.state.append(char.status)
+        self.state.relink()
         
     def addHeroes(self, charID):    
         newHero = Character(charSheet[charID]["name"], charID, self.nextID, hero=True,
                             statSheet=charSheet[charID]["stats"],
                             moveList=charSheet[charID]["movelist"],
-                            genome=self.active_genome)
+                            genome=self.active_genome,
+                            brain=AIBrain.compile(self.active_genome) if self.active_genome is not None else None)
         self.charList.append(newHero)
+        self._register(newHero)
         self.allyList.append(self.nextID)
         self.nextID += 1
     
@@ -407,67 +583,70 @@ class BattleManager:
                             statSheet=charSheet[charID]["stats"],
                             moveList=charSheet[charID]["movelist"])
         self.charList.append(newFoe)
+        self._register(newFoe)
         self.foeList.append(self.nextID)
         self.nextID += 1
     
     # Retorna como está o status da batalha atual
+    # É o estado vivo, os dicts mudam conforme a batalha anda (use dumpStats para uma foto)
     def getBattleStatus(self):
-        combatants = []
-        for x in self.charList:
-            combatants.append(x.dumpStats())
-        return combatants
+        return self.state
     
     # Pede e aplica um movimento para o personagem
     def requestMove(self):
         if self.verbose: self.print_status()
         
-        # Quem deve ser o próximo a se movimentar
-        arenaPlayers = len(self.charList)        
-        nextMove = self.falseTurn % arenaPlayers
-        while True:
-            if self.charList[nextMove].isAlive:
-                break
-            self.falseTurn += 1
-            nextMove = self.falseTurn % arenaPlayers
+        # Quem deve ser o próximo a se movimentar: o primeiro vivo do anel a partir da vez atual
+        # O falseTurn avança um por morto pulado, como se tivesse passado por eles
+        arenaPlayers = len(self.charList)
+        pos = self.falseTurn % arenaPlayers
+        nextMove = self.state.nextActor(pos)
+        self.falseTurn += (nextMove - pos) % arenaPlayers
         
         # Pede o movimento para o personagem
         move, enemyList = self.charList[nextMove].act(self.getBattleStatus())
         
         if enemyList[0] == -1:
             print(f"[WARN] {self.charList[nextMove].name} não tem alvos.")
+            if self.tracing: self.recorder.action(self, nextMove, move, [], []) # Vez perdida, sem golpe
             self.turn += 1
             self.falseTurn += 1
             return
         
         # Para cada alvo válido
-        for x in enemyList:
-            self.applyMove(self.charList[nextMove].ID, x, move)
+        if self.tracing:
+            results = [self.applyMove(self.charList[nextMove].ID, x, move) for x in enemyList]
+        else:
+            for x in enemyList:
+                self.applyMove(self.charList[nextMove].ID, x, move)
         
         # Recursos Consumidos
-        self.charList[nextMove].addSP(-moveSheet[move]["SPCost"])
-        self.charList[nextMove].addMP(-moveSheet[move]["MPCost"])
+        _, spCost, mpCost = MOVE_ROWS[move][:3]
+        self.charList[nextMove].addSP(-spCost)
+        self.charList[nextMove].addMP(-mpCost)
         
         # Regen passivo de SP para o heroi
         if self.charList[nextMove].isHero == True: self.charList[nextMove].addSP(0.2*self.charList[nextMove].stats["SP"])
         
-    # Aplica o movimento
+        if self.tracing: self.recorder.action(self, nextMove, move, enemyList, results)
+        
+    # Aplica o movimento, retorna o dano causado ou o HP recuperado
     def applyMove(self, userID, affectedID, move):
-        isSelf = 1 if moveSheet[move]["Target"] == 1 else -1
-        basePower = moveSheet[move]["BasePower"]
-        moveName = moveSheet[move]["name"]
+        basePower, _, _, target, moveType, element, moveName = MOVE_ROWS[move]
+        isSelf = 1 if target == 1 else -1
         
         attackerName = self.charList[userID].name
         targetName = self.charList[affectedID].name
         
         
-        mult = CombatAlgorithms.getMultiplier(moveSheet[move]["Element"], self.charList[affectedID].stats["BaseElement"])
+        mult = CombatAlgorithms.getMultiplier(element, self.charList[affectedID].stats["BaseElement"])
         statMult = 0
         damage = 0
         
         if isSelf == -1: # Se não deu self-target
-            if moveSheet[move]["Type"] == 0: # Fisico
+            if moveType == 0: # Fisico
                 statMult = self.charList[userID].stats["Str"]-self.charList[affectedID].stats["Def"]
-            elif moveSheet[move]["Type"] == 1: # Ranged
+            elif moveType == 1: # Ranged
                 statMult = self.charList[userID].stats["Dex"]-self.charList[affectedID].stats["Def"]
             else: # Magico
                 statMult = self.charList[userID].stats["Int"]-self.charList[affectedID].stats["Wis"]
@@ -476,7 +655,9 @@ class BattleManager:
             damage = max(1, int(damage)) # Garante min 1 de dano e inteiro
             
             affectedDMG = self.charList[affectedID].addHP(-damage)
-            if self.charList[userID].isHero == True: self.total_damage_dealt -= affectedDMG
+            if self.charList[userID].isHero == True:
+                self.total_damage_dealt -= affectedDMG
+                self.ledger.append((True, affectedDMG))
 
             if self.verbose:
                 eff_text = ""
@@ -494,21 +675,29 @@ class BattleManager:
                 print(f"{attackerName} usou {moveName} e recuperou {real_healed} HP")
             if self.charList[userID].isHero:
                 self.total_healed += real_healed
+                self.ledger.append((False, real_healed))
+            return real_healed
+        return damage
     
     # O GUI do jogo
     def print_status(self):
         if not self.verbose: return
-        print("\n" + "="*40)
-        print(f"--- TURNO {self.turn} ---")
-        for char in self.charList:
-            if not char.isAlive: continue
-            hp_pct = char.curHP / char.stats["HP"]
+        print(self.formatStatus(self.turn, [(c.name, c.isHero, c.curHP, c.stats["HP"]) for c in self.charList if c.isAlive]))
+        time.sleep(self.turn_delay) # Delay para cada turno
+    
+    # Tela de um turno: barra de vida de cada (Nome, É herói, HP, HP máximo)
+    # Também usada pelo replay do registro de batalhas (battlelog.py)
+    @staticmethod
+    def formatStatus(turn, rows):
+        lines = ["\n" + "="*40, f"--- TURNO {turn} ---"]
+        for name, isHero, curHP, maxHP in rows:
+            hp_pct = curHP / maxHP
             bars = int(hp_pct * 20)
             health_bar = "█" * bars + "░" * (20 - bars)
-            icon = ":-)" if char.isHero else ">:C"
-            print(f"{icon} {char.name[:10]:<10} [{health_bar}] {int(char.curHP)}/{char.stats['HP']}")
-        print("="*40 + "\n")
-        time.sleep(1.0) # Delay para cada turno
+            icon = ":-)" if isHero else ">:C"
+            lines.append(f"{icon} {name[:10]:<10} [{health_bar}] {int(curHP)}/{maxHP}")
+        lines.append("="*40 + "\n")
+        return "\n".join(lines)
     
     # Limpa o cenário pra garantir novos rounds
     def cleanup(self):
@@ -520,6 +709,8 @@ class BattleManager:
         self.allyList = []
         self.foeList = []
         self.total_healed = 0
+        self.state = BattleState()
+        self.ledger = []
     
     # Wrapper de round simples, usado apenas para demonstração interna neste código
     def newRound(self):
@@ -529,42 +720,126 @@ class BattleManager:
         self.round += 1
     
     # Se está todo mundo de um lado morto ou não
+    # Só olha os contadores de vivos, que mudam quando o HP de alguém zera
     def checkDeaths(self):
-        heroAlive = False
-        foeAlive = False
-        for x in self.allyList:
-            if self.charList[x].isAlive == True:
-                heroAlive = True
-        if not heroAlive: return -1 # LOSE
-                
-        for x in self.foeList:
-            if self.charList[x].isAlive == True:
-                foeAlive = True
-        if not foeAlive: return 1 # WIN
+        if self.state.aliveCount[True] == 0: return -1 # LOSE
+        if self.state.aliveCount[False] == 0: return 1 # WIN
         return 0 # Ainda está rolando
     
-    # Loop principal de batalha, apenas para se um lado morrer inteiramente
-    def battleLoop(self):
-        self.addHeroes(0)
-        numEnemies = random.randint(1, 3)
+    # Estado compacto da batalha: de quem é a vez e HP/SP/MP/vivo de cada personagem
+    # As políticas são determinísticas, então o mesmo estado sempre leva ao mesmo próximo estado
+    def stateKey(self):
+        return (self.falseTurn % len(self.charList),
+                tuple((c.curHP, c.curSP, c.curMP, c.isAlive) for c in self.charList))
+    
+    # A batalha voltou para o estado do começo da iteração start: vai repetir o mesmo ciclo até o limite de turnos
+    # Ninguém morre num ciclo, então o fim é o empate por exaustão. Pula direto pra ele, somando o dano e a cura
+    # de cada iteração pulada na mesma ordem (resultado idêntico ao de simular tudo)
+    def skipCycle(self, history, start, enemy_max_hp_total):
+        now = len(history)
+        period = now - start
+        history.append((self.turn, self.falseTurn, len(self.ledger), None))
+        dTurn = self.turn - history[start][0]
+        dFalse = self.falseTurn - history[start][1]
+        
+        m = now
+        while True:
+            # Iteração m repete a src do ciclo
+            src = start + (m - start) % period
+            for isDamage, value in self.ledger[history[src][2]:history[src + 1][2]]:
+                if isDamage: self.total_damage_dealt -= value
+                else: self.total_healed += value
+            # Começo da iteração seguinte, o turno da checagem de empate é um a menos
+            laps, r = divmod(m + 1 - start, period)
+            turn = history[start + r][0] + laps * dTurn
+            if turn - 1 > TURN_LIMIT: break
+            m += 1
+        
+        _, states = history[start + r][3]
+        for char, (hp, sp, mp, _) in zip(self.charList, states):
+            char.restore(hp, sp, mp)
+        self.turns_saved += turn - 1 - self.turn
+        if self.verbose: print(f"Ciclo de {period} turnos detectado, pulando {turn - 1 - self.turn} turnos")
+        self.turn = turn - 1
+        self.falseTurn = history[start + r][1] + laps * dFalse - 1
+        return 0, self.total_damage_dealt, enemy_max_hp_total, self.total_healed # Empate por exaustão
+    
+    # Sorteia um encontro, retorna a lista ordenada de typeIDs dos inimigos
+    # A única fonte de aleatoriedade da batalha está aqui
+    @staticmethod
+    def rollEncounter():
+        numEnemies = random.randint(1, MAX_FOES)
         
-        bossRound = random.randint(1,10)
+        bossRound = random.randint(1, BOSS_CHANCE)
         if bossRound == 1:
-            self.addFoes(7) # Ifrit
-        else:
-            for _ in range(numEnemies):
-                self.addFoes(random.randint(1, 6))
-            
+            return [BOSS_ID]
+        return [random.choice(FOE_IDS) for _ in range(numEnemies)]
+    
+    # Cronograma compacto de encontros, uma linha por batalha: [É Boss, Nº de inimigos, IDs dos inimigos...]
+    # Slots de inimigo não usados ficam com -1
+    @staticmethod
+    def rollSchedule(count):
+        schedule = np.full((count, 2 + MAX_FOES), -1, dtype=np.int8)
+        for i in range(count):
+            foes = BattleManager.rollEncounter()
+            schedule[i, 0] = 1 if foes == [BOSS_ID] else 0
+            schedule[i, 1] = len(foes)
+            schedule[i, 2:2 + len(foes)] = foes
+        return schedule
+    
+    # Converte o cronograma compacto de volta para a lista de encontros do battleLoop
+    @staticmethod
+    def scheduleEncounters(schedule):
+        return [[int(x) for x in row[2:2 + row[1]]] for row in schedule]
+    
+    # Lista todos os encontros distintos possíveis e a probabilidade real de cada um
+    # Boss + todas as sequências ordenadas de 1 a MAX_FOES inimigos (6 + 36 + 216 = 258)
+    @staticmethod
+    def allEncounters():
+        encounters = [([BOSS_ID], 1.0 / BOSS_CHANCE)]
+        countChance = (1.0 - 1.0 / BOSS_CHANCE) / MAX_FOES
+        for numEnemies in range(1, MAX_FOES + 1):
+            seqChance = countChance / (len(FOE_IDS) ** numEnemies)
+            for foes in itertools.product(FOE_IDS, repeat=numEnemies):
+                encounters.append((list(foes), seqChance))
+        return encounters
+    
+    # Loop principal de batalha, apenas para se um lado morrer inteiramente
+    # Se um encontro (lista de typeIDs) não for passado, sorteia um
+    # Com um gravador ligado (self.recorder), a batalha pode ser gravada: ele decide no começo e recebe o resultado no fim
+    def battleLoop(self, encounter=None):
+        self.addHeroes(0)
+        if encounter is None:
+            encounter = self.rollEncounter()
+        for foeID in encounter:
+            self.addFoes(foeID)
+        
+        self.tracing = self.recorder is not None and self.recorder.begin(self)
+        result = self._battleLoop()
+        if self.tracing: self.recorder.end(self, result)
+        return result
+    
+    def _battleLoop(self):
         enemy_max_hp_total = 0
         for x in self.foeList:
             enemy_max_hp_total += self.charList[x].stats["HP"]
         
+        seen = {} # Estado compacto -> iteração em que apareceu
+        history = [] # (turn, falseTurn, tamanho do ledger, estado) no começo de cada iteração
         while True:
+            if CYCLE_DETECTION and self.turn >= CYCLE_MIN_TURN:
+                key = self.stateKey()
+                start = seen.get(key)
+                if start is not None:
+                    return self.skipCycle(history, start, enemy_max_hp_total)
+                seen[key] = len(history)
+                history.append((self.turn, self.falseTurn, len(self.ledger), key))
+            
             self.requestMove()
             battleStatus = self.checkDeaths()
             
             # Limite de segurança (para evitar loops infinitos de cura vs cura)
-            if self.turn > 100: 
+            if self.turn > TURN_LIMIT: 
                 return 0, self.total_damage_dealt, enemy_max_hp_total, self.total_healed # Empate por exaustão
             
             if battleStatus != 0: return battleStatus , self.total_damage_dealt, enemy_max_hp_total, self.total_healed
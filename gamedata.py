@@ -0,0 +1,192 @@
+import os
+import pickle
+import numpy as np # type: ignore
+
+# Dados do jogo compilados
+# Lê os JSONs de moves e personagens e pré-calcula tabelas prontas para o combate
+# Colunas tipadas do NumPy para as partes vetorizadas (batch, inputs do cérebro)
+# e tuplas simples para as partes escalares (applyMove, procedural)
+#
+# As tabelas são carregadas uma vez por processo, na primeira vez que alguém pede uma delas (tables() ou gamedata.NOME)
+# O "from gamedata import *" do classes.py e do batch.py pede todas, então importar o simulador já carrega os dados
+# (só "import gamedata", sem pedir nenhuma tabela, ainda não carrega nada)
+# Os JSONs são procurados ao lado deste arquivo, não importa de qual pasta o processo foi aberto
+# O resultado compilado fica em cache (__pycache__/gamedata.cache), processos novos só leem o binário
+# O cache vale enquanto os JSONs tiverem o mesmo mtime/tamanho, ou, se mudaram, o mesmo conteúdo (hash)
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+SHEET_FILES = ("movelist.json", "charSheet.json")
+CACHE_FILE = os.path.join(DATA_DIR, "__pycache__", "gamedata.cache")
+CACHE_VERSION = 2 # Mude quando o _compile passar a gerar tabelas diferentes
+
+# Cheat Sheet: (O que cada coisa significa)
+# Function: Ataque ou Buff
+# 0 : Attack
+# 1 : Buff
+#
+# Type: Qual o Tipo usado
+# 0: Physical
+# 1: Ranged
+# 2: Magic
+#
+# Target: Quem está sendo atingido
+# 0: Single
+# 1: Self
+# 2: Multi
+#
+# Element: Qual elemento é o ataque
+# 0 : Normal
+# 1 : Fire
+# 2 : Water
+# 3 : Plant
+# 4 : Light
+# 5 : Dark
+
+NUM_ELEMENTS = 6
+
+# Matchup Elementais, (ex: Fogo é fraco contra Água)
+TYPE_CHART = {
+    (1, 3): 2.0,
+    (1, 2): 0.5,
+    (1, 1): 0.5,
+    (2, 1): 2.0,
+    (2, 3): 0.5,
+    (2, 2): 0.5,
+    (3, 2): 2.0,
+    (3, 1): 0.5,
+    (3, 3): 0.5,
+    (4, 5): 2.0,
+    (4, 4): 0.5,
+    (5, 4): 2.0,
+    (5, 5): 0.5,
+}
+
+# TYPE_CHART como matriz densa [Elemento do ataque, Elemento do alvo]
+TYPE_MATRIX = np.ones((NUM_ELEMENTS, NUM_ELEMENTS))
+for (atk, dfn), value in TYPE_CHART.items():
+    TYPE_MATRIX[atk, dfn] = value
+TYPE_MULT = TYPE_MATRIX.tolist() # Mesma matriz em listas, para consultas escalares
+
+# Vantagem elemental (-1.0, 0.0 ou 1.0), uma linha por elemento do ataque
+ADVANTAGE = np.sign(TYPE_MATRIX - 1.0)
+
+# Compila as tabelas a partir das fichas já lidas do JSON
+def _compile(moveSheet, charSheet):
+    # Colunas dos moves (indexadas pelo ID do move)
+    MOVE_POWER = np.array([m["BasePower"] for m in moveSheet], dtype=np.float64)
+    MOVE_SP = np.array([m["SPCost"] for m in moveSheet], dtype=np.float64)
+    MOVE_MP = np.array([m["MPCost"] for m in moveSheet], dtype=np.float64)
+    MOVE_TARGET = np.array([m["Target"] for m in moveSheet], dtype=np.int8)
+    MOVE_TYPE = np.array([m["Type"] for m in moveSheet], dtype=np.int8)
+    MOVE_ELEM = np.array([m["Element"] for m in moveSheet], dtype=np.int8)
+    MOVE_IS_HEAL = (MOVE_TARGET == 1) & (MOVE_TYPE == 2)
+    MOVE_IS_AOE = MOVE_TARGET == 2
+
+    # Inputs estáticos de cada move para o cérebro: [Custo, Poder, É cura, É área]
+    MOVE_FEATURES = np.stack([MOVE_SP / 50.0, MOVE_POWER / 100.0,
+                              MOVE_IS_HEAL.astype(np.float64), MOVE_IS_AOE.astype(np.float64)], axis=1)
+
+    # Poder de ataque de cada move, -1 para os que acertam o próprio usuário (nunca escolhidos pelo procedural)
+    ATTACK_POWER = [m["BasePower"] if m["Target"] != 1 else -1 for m in moveSheet]
+
+    # Cada move como tupla escalar: (Poder, Custo SP, Custo MP, Alvo, Tipo, Elemento, Nome)
+    MOVE_ROWS = [(m["BasePower"], m["SPCost"], m["MPCost"], m["Target"], m["Type"], m["Element"], m["name"])
+                 for m in moveSheet]
+
+    # Colunas dos personagens (indexadas pelo typeID)
+    def _charColumn(key, dtype=np.float64):
+        return np.array([c["stats"][key] for c in charSheet], dtype=dtype)
+
+    CHAR_HP = _charColumn("HP")
+    CHAR_SP = _charColumn("SP")
+    CHAR_MP = _charColumn("MP")
+    CHAR_STR = _charColumn("Str")
+    CHAR_DEX = _charColumn("Dex")
+    CHAR_INT = _charColumn("Int")
+    CHAR_DEF = _charColumn("Def")
+    CHAR_WIS = _charColumn("Wis")
+    CHAR_ELEM = _charColumn("BaseElement", np.int8)
+
+    # Movelists com padding de -1
+    CHAR_MOVES = np.full((len(charSheet), max(len(c["movelist"]) for c in charSheet)), -1)
+    for i, c in enumerate(charSheet):
+        CHAR_MOVES[i, :len(c["movelist"])] = c["movelist"]
+
+    # Moves de cura de cada personagem
+    HEAL_MOVES = [[m for m in c["movelist"] if MOVE_IS_HEAL[m]] for c in charSheet]
+    
+    return {name: value for name, value in locals().items() if name in TABLE_NAMES}
+
+# Nomes de tudo que o _compile gera (e que o "from gamedata import *" exporta)
+TABLE_NAMES = ("moveSheet", "charSheet",
+               "MOVE_POWER", "MOVE_SP", "MOVE_MP", "MOVE_TARGET", "MOVE_TYPE", "MOVE_ELEM", "MOVE_IS_HEAL", "MOVE_IS_AOE",
+               "MOVE_FEATURES", "ATTACK_POWER", "MOVE_ROWS",
+               "CHAR_HP", "CHAR_SP", "CHAR_MP", "CHAR_STR", "CHAR_DEX", "CHAR_INT", "CHAR_DEF", "CHAR_WIS", "CHAR_ELEM",
+               "CHAR_MOVES", "HEAL_MOVES")
+
+# Carrega as tabelas do cache, ou recompila dos JSONs se eles mudaram
+def _load():
+    paths = [os.path.join(DATA_DIR, name) for name in SHEET_FILES]
+    stamp = [CACHE_VERSION] + [(os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in paths]
+    
+    cached = None
+    try:
+        with open(CACHE_FILE, "rb") as f:
+            cached = pickle.load(f)
+    except Exception: # Sem cache, ou cache de outra versão/corrompido
+        pass
+    if cached is not None and cached["stamp"] == stamp:
+        return cached["tables"]
+    
+    # Os JSONs foram tocados: só recompila se o conteúdo realmente mudou
+    import hashlib
+    raw = []
+    for p in paths:
+        with open(p, "rb") as f:
+            raw.append(f.read())
+    digest = hashlib.sha256(str(CACHE_VERSION).encode() + b"".join(raw)).hexdigest()
+    if cached is not None and cached["hash"] == digest:
+        tables = cached["tables"]
+    else:
+        import json
+        tables = _compile(*(json.loads(data) for data in raw))
+    
+    # Grava o cache atomicamente (se a pasta não der pra escrever, só segue sem cache)
+    try:
+        os.makedirs(os.path.dirname(CACHE_FILE), exist_ok=True)
+        tmp = f"{CACHE_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"stamp": stamp, "hash": digest, "tables": tables}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, CACHE_FILE)
+    except OSError:
+        pass
+    return tables
+
+# O registro: carrega uma vez e publica as tabelas como globais do módulo
+_tables = None
+
+def tables():
+    global _tables
+    if _tables is None:
+        _tables = _load()
+        globals().update(_tables)
+    return _tables
+
+# gamedata.NOME carrega as tabelas na primeira vez, e o "from gamedata import *" passa por aqui para cada nome do __all__
+def __getattr__(name):
+    if name in TABLE_NAMES:
+        return tables()[name]
+    raise AttributeError(f"module 'gamedata' has no attribute '{name}'")
+
+# Quais moves dá pra pagar com o SP/MP atual, numa comparação só (moves e recursos podem ser arrays)
+def affordable(moves, curSP, curMP):
+    tables()
+    return (MOVE_SP[moves] <= curSP) & (MOVE_MP[moves] <= curMP)
+
+# (Move, Custo SP, Custo MP) de cada move da lista, para a checagem escalar do Character
+def moveCosts(moves):
+    tables()
+    return [(move, MOVE_ROWS[move][1], MOVE_ROWS[move][2]) for move in moves]
+
+__all__ = ["NUM_ELEMENTS", "TYPE_CHART", "TYPE_MATRIX", "TYPE_MULT", "ADVANTAGE",
+           "affordable", "moveCosts", "tables"] + list(TABLE_NAMES)
@@ -0,0 +1,120 @@
+import os
+import json
+import zlib
+import struct
+import numpy as np # type: ignore
+
+# Arquivo binário de genoma: cabeçalho fixo + os pesos crus, lidos sem cópia (np.frombuffer ou mmap)
+# O JSON (lista de floats) continua funcionando como formato de exportação, o load_genome lê os dois
+#
+# Layout (little-endian):
+#   Cabeçalho (64 bytes): MAGIC, versão (uint16), dtype (4 bytes, ex: "<f4"),
+#                         Input, Hidden (uint16), número de pesos (uint32),
+#                         geração (int64, -1 = desconhecida), fitness (float64, NaN = desconhecido),
+#                         CRC32 dos pesos (uint32), zeros até completar 64 bytes
+#   Pesos: número de pesos * tamanho do dtype, na ordem do AIBrain (W1, B1, W2, B2)
+
+MAGIC = b"RPGGENOM"
+VERSION = 1
+HEADER = struct.Struct("<8sH4sHHIqdI")
+HEADER_SIZE = 64
+DTYPES = ("<f4", "<f8") # float32, float64
+
+# Número de pesos da arquitetura Input -> Hidden -> 1 do AIBrain
+def genome_size(input_size=12, hidden_size=8):
+    return input_size * hidden_size + hidden_size + hidden_size + 1
+
+# Grava o genoma no formato binário (no dtype do próprio genoma, ou no dtype pedido)
+# A escrita vai para um arquivo temporário e só substitui o antigo quando completa
+def write_genome(filename, genome, generation=None, fitness=None, dtype=None, input_size=12, hidden_size=8):
+    genome = np.asarray(genome, dtype=dtype)
+    if genome.dtype.str not in DTYPES:
+        genome = genome.astype(np.float64)
+    if genome.shape != (genome_size(input_size, hidden_size),):
+        raise ValueError(f"Genoma com formato {genome.shape}, esperado ({genome_size(input_size, hidden_size)},)")
+    payload = np.ascontiguousarray(genome).tobytes()
+    header = HEADER.pack(MAGIC, VERSION, genome.dtype.str.encode(), input_size, hidden_size, len(genome),
+                         -1 if generation is None else int(generation),
+                         float("nan") if fitness is None else float(fitness),
+                         zlib.crc32(payload))
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\0"))
+        f.write(payload)
+    os.replace(tmp, filename)
+
+# Lê e valida o cabeçalho (bytes do começo do arquivo), retorna um dict
+def parse_header(data, filename="<genoma>"):
+    if len(data) < HEADER_SIZE or data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"'{filename}' não é um arquivo de genoma")
+    magic, version, dtype, input_size, hidden_size, size, generation, fitness, crc = HEADER.unpack_from(data)
+    if version != VERSION:
+        raise ValueError(f"'{filename}' tem a versão {version} do formato, esperado {VERSION}")
+    dtype = dtype.rstrip(b"\0").decode()
+    if dtype not in DTYPES:
+        raise ValueError(f"'{filename}' tem dtype desconhecido: {dtype}")
+    if size != genome_size(input_size, hidden_size):
+        raise ValueError(f"'{filename}' tem {size} pesos, a arquitetura {input_size}x{hidden_size} pede {genome_size(input_size, hidden_size)}")
+    return {
+        "version": version,
+        "dtype": np.dtype(dtype),
+        "input_size": input_size,
+        "hidden_size": hidden_size,
+        "size": size,
+        "generation": None if generation < 0 else generation,
+        "fitness": None if fitness != fitness else fitness, # NaN = desconhecido
+        "crc32": crc,
+    }
+
+# Lê um genoma binário, retorna (genoma, cabeçalho)
+# O genoma é uma view somente leitura sobre os bytes do arquivo (mmap=True: mapeado, lido do disco sob demanda)
+# verify: confere o CRC32 dos pesos
+def read_genome(filename, mmap=False, verify=True):
+    if mmap:
+        with open(filename, "rb") as f:
+            header = parse_header(f.read(HEADER_SIZE), filename)
+        genome = np.memmap(filename, dtype=header["dtype"], mode="r", offset=HEADER_SIZE, shape=(header["size"],))
+    else:
+        with open(filename, "rb") as f:
+            data = f.read()
+        header = parse_header(data, filename)
+        if len(data) < HEADER_SIZE + header["size"] * header["dtype"].itemsize:
+            raise ValueError(f"'{filename}' está incompleto")
+        genome = np.frombuffer(data, dtype=header["dtype"], count=header["size"], offset=HEADER_SIZE)
+    if verify and zlib.crc32(genome.tobytes()) != header["crc32"]:
+        raise ValueError(f"'{filename}' está corrompido (CRC32 não confere)")
+    return genome, header
+
+# O arquivo começa com o MAGIC do formato binário?
+def is_genome_file(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+# Lê um genoma binário ou JSON (lista de floats, o formato antigo)
+def load_genome(filename, mmap=False):
+    if is_genome_file(filename):
+        return read_genome(filename, mmap)[0]
+    with open(filename, "r") as f:
+        return np.array(json.load(f))
+
+# Exporta um genoma como JSON (lista de floats)
+def export_json(genome, filename):
+    with open(filename, "w") as f:
+        json.dump(np.asarray(genome, dtype=np.float64).tolist(), f)
+
+if __name__ == "__main__":
+    # Mostra o cabeçalho de um genoma binário, ou converte entre os formatos
+    #   python genomefile.py champion.genome
+    #   python genomefile.py champion.json champion.genome [--float32]
+    import sys
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if len(args) == 1:
+        genome, header = read_genome(args[0])
+        for k, v in header.items(): print(f"{k}: {v}")
+    else:
+        genome = load_genome(args[0])
+        if args[1].endswith(".json"):
+            export_json(genome, args[1])
+        else:
+            write_genome(args[1], genome, dtype=np.float32 if "--float32" in sys.argv else None)
+        print(f"Genoma salvo em: {args[1]}")
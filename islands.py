@@ -0,0 +1,167 @@
+import os
+import time
+import random
+import queue
+import argparse
+import threading
+import numpy as np # type: ignore
+
+import train
+
+# Modelo de ilhas: ISLANDS populações independentes, cada uma num processo com o train() inteiro
+# (sua própria estagnação, mutação adaptativa e genocídio), ligadas num anel
+# A cada MIGRATION_INTERVAL gerações cada ilha manda seus MIGRANTS melhores genomas pra próxima
+# e recebe os da anterior, que substituem os últimos filhos da próxima geração
+#
+# Cada ilha grava seus próprios arquivos (métricas, checkpoint, campeão...) com o sufixo _island<N>
+# No fim o melhor campeão entre as ilhas é salvo no CHAMPION_FILE do train.py
+#
+#   python islands.py                  # Treina do zero
+#   python islands.py --resume         # Continua dos checkpoints das ilhas
+#   python plot.py metrics_island0.jsonl -o ilha0.png
+
+# Parâmetros das Ilhas (o resto vem do train.py)
+ISLANDS = 4 # Quantas populações (e processos)
+MIGRATION_INTERVAL = 10 # A cada quantas gerações as ilhas trocam genomas
+MIGRANTS = 2 # Quantos dos melhores genomas cada ilha manda pra vizinha
+TRANSPORT = "pipe" # Como os genomas viajam entre as ilhas
+                   # "pipe": multiprocessing.Pipe, só na mesma máquina
+                   # "socket": TCP em HOST:BASE_PORT+N (a ilha N escuta na sua porta e conecta na da próxima)
+HOST = "localhost"
+BASE_PORT = 6100
+AUTHKEY = b"jogador-rpg-evolutivo" # Chave das conexões por socket
+CONNECT_TIMEOUT = 30.0 # Segundos esperando a ilha vizinha abrir a porta
+
+# Ponta de uma ilha no anel: manda pra próxima e recebe da anterior
+# send_conn e recv_conn são Connection do multiprocessing (pipe ou socket, mesma interface)
+class Island:
+    def __init__(self, index, send_conn, recv_conn, interval=MIGRATION_INTERVAL, migrants=MIGRANTS):
+        self.index = index
+        self.send_conn = send_conn
+        self.recv_conn = recv_conn
+        self.interval = interval
+        self.migrants = migrants
+
+    # Manda genomas (N, Tamanho do genoma) e devolve os que chegaram da ilha anterior (no mesmo dtype)
+    # O envio fica numa thread: com todas as ilhas mandando ao mesmo tempo, um envio maior
+    # que o buffer do pipe travaria o anel inteiro esperando alguém ler
+    def exchange(self, genomes):
+        genomes = np.ascontiguousarray(genomes)
+        sender = threading.Thread(target=self.send_conn.send_bytes, args=(genomes.tobytes(),))
+        sender.start()
+        data = self.recv_conn.recv_bytes()
+        sender.join()
+        return np.frombuffer(data, dtype=genomes.dtype).reshape(-1, genomes.shape[1])
+
+    def close(self):
+        self.send_conn.close()
+        self.recv_conn.close()
+
+# Liga a ilha index às vizinhas por TCP: escuta na própria porta, conecta na da próxima e aceita a anterior
+def connect_socket(index, count, host=HOST, base_port=BASE_PORT):
+    from multiprocessing.connection import Listener, Client
+    listener = Listener((host, base_port + index), authkey=AUTHKEY)
+    # A autenticação do Client só termina quando a vizinha está no accept(), então o accept roda
+    # numa thread (senão todas as ilhas ficam presas conectando ao mesmo tempo)
+    accepted = []
+    acceptor = threading.Thread(target=lambda: accepted.append(listener.accept()))
+    acceptor.start()
+    deadline = time.monotonic() + CONNECT_TIMEOUT
+    while True:
+        try:
+            send_conn = Client((host, base_port + (index + 1) % count), authkey=AUTHKEY)
+            break
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline: raise
+            time.sleep(0.05) # A vizinha ainda não abriu a porta
+    acceptor.join()
+    listener.close()
+    return send_conn, accepted[0]
+
+# Nome do arquivo de uma ilha: "metrics.jsonl" -> "metrics_island2.jsonl"
+def island_file(filename, index):
+    root, ext = os.path.splitext(filename)
+    return f"{root}_island{index}{ext}"
+
+# Seed de cada ilha, derivada da seed mestre (ou sorteada, ilhas nunca podem começar iguais)
+def island_seeds(master_seed, count):
+    if master_seed is None:
+        master_seed = random.SystemRandom().randrange(2**32)
+    return [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(master_seed).spawn(count)]
+
+# Processo de uma ilha: ajusta os parâmetros do train.py só nesta cópia e roda o treino
+def run_island(index, count, seed, conns, resume, results):
+    if conns is None: conns = connect_socket(index, count)
+    island = Island(index, *conns)
+
+    train.MASTER_SEED = seed
+    train.PLOT_AT_END = False
+    for name in ("METRICS_FILE", "CHECKPOINT_FILE", "ARCHIVE_FILE", "PROFILE_FILE", "CHAMPION_FILE", "TRACE_FILE"):
+        setattr(train, name, island_file(getattr(train, name), index))
+    champion, fitness = train.train(resume=train.CHECKPOINT_FILE if resume else None, island=island)
+    island.close()
+    results.put((index, champion, fitness))
+
+def run_islands(count=ISLANDS, transport=TRANSPORT, resume=False):
+    import multiprocessing as mp
+    if count < 2:
+        raise ValueError("O modelo de ilhas precisa de pelo menos 2 ilhas")
+    if MIGRANTS > train.POPULATION_SIZE - train.ELITES:
+        raise ValueError(f"MIGRANTS ({MIGRANTS}) não pode passar de POPULATION_SIZE - ELITES ({train.POPULATION_SIZE - train.ELITES})")
+
+    # Anel de pipes: o pipe k vai da ilha k pra ilha k+1
+    ring = None
+    if transport == "pipe":
+        pipes = [mp.Pipe(duplex=False) for _ in range(count)] # (Leitura, Escrita)
+        ring = [(pipes[k][1], pipes[k - 1][0]) for k in range(count)] # (Manda pra próxima, Recebe da anterior)
+    elif transport != "socket":
+        raise ValueError(f"TRANSPORT desconhecido: {transport}")
+    # As ilhas só trocam genomas na mesma geração, todas precisam continuar do mesmo ponto
+    if resume:
+        missing = [island_file(train.CHECKPOINT_FILE, k) for k in range(count) if not os.path.exists(island_file(train.CHECKPOINT_FILE, k))]
+        if missing:
+            raise FileNotFoundError(f"Checkpoints das ilhas não encontrados: {', '.join(missing)}")
+        generations = []
+        for k in range(count):
+            with np.load(island_file(train.CHECKPOINT_FILE, k)) as data:
+                generations.append(int(data["gen"]))
+        if len(set(generations)) > 1:
+            raise ValueError(f"Checkpoints das ilhas em gerações diferentes: {generations}, a migração sairia do passo")
+
+    print(f"Ilhas: {count} | Migração: {MIGRANTS} genomas a cada {MIGRATION_INTERVAL} gerações ({transport})")
+    results = mp.Queue()
+    processes = []
+    for k, seed in enumerate(island_seeds(train.MASTER_SEED, count)):
+        conns = ring[k] if ring is not None else None
+        process = mp.Process(target=run_island, args=(k, count, seed, conns, resume, results))
+        process.start()
+        processes.append(process)
+
+    # Uma ilha que morre deixa a vizinha esperando a migração pra sempre, então derruba todas
+    finished = []
+    while len(finished) < count:
+        try:
+            finished.append(results.get(timeout=1.0))
+        except queue.Empty:
+            failed = [k for k, p in enumerate(processes) if p.exitcode not in (None, 0)]
+            if failed:
+                for process in processes: process.terminate()
+                raise RuntimeError(f"Ilha(s) {failed} terminaram com erro")
+    for process in processes: process.join()
+
+    # Melhor campeão entre as ilhas (fitness da última geração de cada uma)
+    finished.sort(key=lambda r: -np.inf if r[2] is None else r[2], reverse=True)
+    for index, _, fitness in sorted(finished):
+        print(f"Ilha {index}: MaxFit {fitness:.0f}" if fitness is not None else f"Ilha {index}: sem gerações")
+    best_index, champion, fitness = finished[0]
+    print(f"Melhor ilha: {best_index}")
+    train.save_champion(champion, train.CHAMPION_FILE, train.GENERATIONS - 1, fitness)
+    return champion
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Treina o genoma do herói com várias populações (modelo de ilhas)")
+    parser.add_argument("--islands", type=int, default=ISLANDS, help="quantidade de ilhas")
+    parser.add_argument("--transport", choices=["pipe", "socket"], default=TRANSPORT, help="transporte da migração")
+    parser.add_argument("--resume", action="store_true", help="continua dos checkpoints de cada ilha")
+    args = parser.parse_args()
+    run_islands(args.islands, args.transport, args.resume)
@@ -0,0 +1,132 @@
+import numpy as np # type: ignore
+
+# Arquivo de linhagem: a população e o fitness de todas as gerações de um treino
+# Um arquivo binário mapeado em memória (float32), nada fica na RAM além do que for lido
+# O espaço é reservado em blocos de GROW_CHUNK gerações conforme o treino grava, não para o treino todo de uma vez
+#
+# Layout:
+#   Cabeçalho (64 bytes): MAGIC + int64 [Tamanho do genoma, População, Capacidade, Gravadas, Primeira geração]
+#   Registros: (Capacidade, População, Tamanho do genoma + 1) float32
+#              a última coluna de cada linha é o fitness do genoma
+#
+# O contador de gerações gravadas só sobe depois que o registro foi escrito,
+# então um treino que morre no meio deixa um arquivo válido até a última geração completa
+
+MAGIC = b"LINEAGE1"
+HEADER_SIZE = 64
+HEADER_FIELDS = 5 # genome_size, population, capacity, written, first
+GROW_CHUNK = 64 # Gerações reservadas de cada vez quando o arquivo enche
+
+class LineageArchive:
+    # mode "w": cria (ou sobrescreve) um arquivo com espaço para capacity gerações
+    # mode "r+": abre um arquivo existente para continuar gravando
+    # mode "r": só leitura
+    # first: número da geração guardada no primeiro registro (treinos continuados de um checkpoint)
+    def __init__(self, filename, mode="r", genome_size=None, population=None, capacity=None, first=0):
+        self.filename = filename
+        self.mode = mode
+        if mode == "w":
+            if genome_size is None or population is None or capacity is None:
+                raise ValueError("Criar um arquivo de linhagem exige genome_size, population e capacity")
+            with open(filename, "wb") as f:
+                f.write(MAGIC)
+                f.write(np.array([genome_size, population, capacity, 0, first], dtype=np.int64).tobytes())
+                f.truncate(HEADER_SIZE + capacity * population * (genome_size + 1) * 4)
+            self.mode = mode = "r+"
+
+        with open(filename, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"'{filename}' não é um arquivo de linhagem")
+        self._map()
+
+    # (Re)mapeia cabeçalho e registros
+    def _map(self):
+        self.header = np.memmap(self.filename, dtype=np.int64, mode=self.mode, offset=len(MAGIC), shape=(HEADER_FIELDS,))
+        self.genome_size, self.population_size, self.capacity = (int(x) for x in self.header[:3])
+        self.records = np.memmap(self.filename, dtype=np.float32, mode=self.mode, offset=HEADER_SIZE,
+                                 shape=(self.capacity, self.population_size, self.genome_size + 1))
+
+    # Quantas gerações já foram gravadas
+    def __len__(self):
+        return int(self.header[3])
+
+    # Geração do primeiro registro
+    @property
+    def first(self):
+        return int(self.header[4])
+
+    # Gerações disponíveis, na numeração do treino
+    @property
+    def generations(self):
+        return range(self.first, self.first + len(self))
+
+    def _index(self, gen):
+        if gen not in self.generations:
+            raise IndexError(f"Geração {gen} fora do arquivo (tem {self.generations.start} a {self.generations.stop - 1})")
+        return gen - self.first
+
+    # Grava a próxima geração: população (População, Tamanho do genoma) e fitness (População,)
+    def append(self, population, fitness):
+        written = len(self)
+        if written == self.capacity:
+            self.grow(self.capacity + GROW_CHUNK)
+        record = self.records[written]
+        record[:, :self.genome_size] = population
+        record[:, self.genome_size] = fitness
+        self.header[3] = written + 1
+
+    # Aumenta a capacidade do arquivo
+    def grow(self, capacity):
+        if capacity <= self.capacity: return
+        self._resize(capacity)
+
+    def _resize(self, capacity):
+        self.flush()
+        del self.records
+        with open(self.filename, "r+b") as f:
+            f.truncate(HEADER_SIZE + capacity * self.population_size * (self.genome_size + 1) * 4)
+        self.header[2] = capacity
+        self.header.flush()
+        self._map()
+
+    # Esquece as gerações a partir de gen (para continuar um treino de um checkpoint mais antigo)
+    def truncate(self, gen):
+        self.header[3] = max(0, min(len(self), gen - self.first))
+
+    # Genomas de uma geração, (População, Tamanho do genoma)
+    # É uma view do arquivo, só é lida do disco quando usada
+    def population(self, gen):
+        return self.records[self._index(gen), :, :self.genome_size]
+
+    # Fitness de cada genoma de uma geração
+    def fitness(self, gen):
+        return self.records[self._index(gen), :, self.genome_size]
+
+    # Um gene de todos os genomas em todas as gerações gravadas, (Gerações, População)
+    def gene(self, index):
+        return self.records[:len(self), :, index]
+
+    def flush(self):
+        if self.mode != "r":
+            self.records.flush()
+            self.header.flush()
+
+    def close(self):
+        if self.mode != "r" and self.capacity > max(1, len(self)):
+            self._resize(max(1, len(self))) # Devolve o espaço reservado que não foi usado
+        self.flush()
+        del self.records
+        del self.header
+
+# Abre um arquivo de linhagem só para leitura
+def read_lineage(filename="lineage.bin"):
+    return LineageArchive(filename, "r")
+
+if __name__ == "__main__":
+    # Resumo rápido do arquivo
+    import sys
+    archive = read_lineage(sys.argv[1] if len(sys.argv) > 1 else "lineage.bin")
+    print(f"Genoma: {archive.genome_size} | População: {archive.population_size} | Gerações: {len(archive)}/{archive.capacity}")
+    for gen in archive.generations:
+        fitness = archive.fitness(gen)
+        print(f"Gen {gen}: MaxFit {fitness.max():.0f} | AvgFit {fitness.mean():.0f}")
@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+from classes import AIBrain, BattleManager, CombatAlgorithms, TURN_LIMIT
+from server import DecisionServer, LatencyHistogram, available_moves, BATCH_WINDOW
+
+# Gerador de carga para o server.py: várias conexões mandando fotos reais de batalhas ao mesmo tempo
+# Sem endereço, sobe um servidor local (mesmo processo, socket Unix temporário) só para a medida
+# Mede pedidos por segundo e a latência de ida e volta, e confere cada resposta com o getMove local
+#
+#   python loadgen.py --connections 32 --requests 20000
+#   python loadgen.py --unix /tmp/heroi.sock     # Contra um servidor já rodando
+
+# Fotos do estado em cada vez do herói, tiradas de batalhas jogadas pelo próprio genoma
+# Retorna (battleID do herói, [dumpStats de cada personagem])
+def collect_snapshots(genome, count, seed=0):
+    random.seed(seed)
+    battle = BattleManager()
+    battle.active_genome = genome # type: ignore
+    snapshots = []
+    while len(snapshots) < count:
+        battle.cleanup()
+        battle.addHeroes(0)
+        for foeID in battle.rollEncounter():
+            battle.addFoes(foeID)
+        # Mesmo laço do battleLoop, parando antes de cada vez do herói para tirar a foto
+        while battle.checkDeaths() == 0 and battle.turn <= TURN_LIMIT and len(snapshots) < count:
+            actor = battle.state.nextActor(battle.falseTurn % len(battle.charList))
+            if battle.charList[actor].isHero:
+                snapshots.append((actor, [c.dumpStats() for c in battle.charList]))
+            battle.requestMove()
+            battle.turn += 1
+            battle.falseTurn += 1
+    return snapshots
+
+# O que o getMove local decide para cada foto, e quantas decisões por segundo ele faz
+def expected_decisions(genome, snapshots):
+    brain = AIBrain(genome)
+    expected = []
+    start = time.perf_counter()
+    for actor, situation in snapshots:
+        moves = available_moves(next(x for x in situation if x["battleID"] == actor))
+        move, targets = CombatAlgorithms.getMove(actor, True, situation, moves, brain=brain)
+        expected.append((move, targets))
+    return expected, len(snapshots) / (time.perf_counter() - start)
+
+# Uma conexão: mantém até pipeline pedidos em voo, anota a latência de cada um
+async def _connection(open_conn, jobs, pipeline, latency, answers):
+    reader, writer = await open_conn()
+    slots = asyncio.Semaphore(pipeline)
+    sent = {} # id -> instante do envio
+
+    async def send():
+        for request_id, actor, situation in jobs:
+            await slots.acquire()
+            sent[request_id] = time.perf_counter()
+            writer.write((json.dumps({"id": request_id, "actor": actor, "state": situation}) + "\n").encode())
+            await writer.drain()
+
+    sender = asyncio.ensure_future(send())
+    for _ in range(len(jobs)):
+        response = json.loads(await reader.readline())
+        latency.record(time.perf_counter() - sent.pop(response["id"]))
+        answers[response["id"]] = response
+        slots.release()
+    await sender
+    writer.close()
+    await writer.wait_closed()
+
+async def _stats(open_conn):
+    reader, writer = await open_conn()
+    writer.write(b'{"op": "stats"}\n')
+    stats = json.loads(await reader.readline())
+    writer.close()
+    await writer.wait_closed()
+    return stats
+
+async def run_load(genome, snapshots, requests=10000, connections=16, pipeline=8,
+                   path=None, host=None, port=None, batch_window=BATCH_WINDOW):
+    standin = None
+    tmpdir = None
+    if path is None and host is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        path = os.path.join(tmpdir.name, "heroi.sock")
+        standin = DecisionServer(genome, batch_window)
+        await standin.start(path)
+
+    if path is not None:
+        open_conn = lambda: asyncio.open_unix_connection(path, limit=1 << 20)
+    else:
+        open_conn = lambda: asyncio.open_connection(host, port, limit=1 << 20)
+
+    # Pedidos repartidos entre as conexões, as fotos se repetem em ciclo
+    jobs = [[] for _ in range(connections)]
+    for i in range(requests):
+        actor, situation = snapshots[i % len(snapshots)]
+        jobs[i % connections].append((i, actor, situation))
+
+    latency = LatencyHistogram()
+    answers = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(_connection(open_conn, j, pipeline, latency, answers) for j in jobs if j))
+    elapsed = time.perf_counter() - start
+    stats = await _stats(open_conn)
+
+    if standin is not None:
+        await standin.close()
+        tmpdir.cleanup()
+    return elapsed, latency, answers, stats
+
+def print_report(requests, elapsed, latency, stats, mismatches=None, local_rate=None):
+    client = latency.summary()
+    print(f"Pedidos: {requests} em {elapsed:.2f}s ({requests / elapsed:.0f} pedidos/s)")
+    if local_rate is not None:
+        print(f"getMove local, um por vez: {local_rate:.0f} decisões/s")
+    print(f"Latência (cliente): média {client['mean_ms']:.2f}ms | p50 {client['p50_ms']:.2f}ms | "
+          f"p90 {client['p90_ms']:.2f}ms | p99 {client['p99_ms']:.2f}ms | máx {client['max_ms']:.2f}ms")
+    server = stats["latency"]
+    print(f"Latência (servidor): média {server['mean_ms']:.2f}ms | p50 {server['p50_ms']:.2f}ms | "
+          f"p99 {server['p99_ms']:.2f}ms")
+    print(f"Lotes: {stats['batches']} (média de {stats['avg_batch']:.1f} pedidos por forward pass) | Erros: {stats['errors']}")
+    if mismatches is not None:
+        print(f"Decisões diferentes do getMove local: {mismatches}")
+
+if __name__ == "__main__":
+    from replay import load_champion
+    parser = argparse.ArgumentParser(description="Gerador de carga para o servidor de decisões")
+    parser.add_argument("--champion", default=None, help="genoma usado nas batalhas e no servidor local (padrão: champion.genome ou champion.json)")
+    parser.add_argument("--requests", type=int, default=10000, help="total de pedidos")
+    parser.add_argument("--connections", type=int, default=16, help="conexões simultâneas")
+    parser.add_argument("--pipeline", type=int, default=8, help="pedidos em voo por conexão")
+    parser.add_argument("--snapshots", type=int, default=2000, help="fotos de batalha diferentes")
+    parser.add_argument("--window", type=float, default=BATCH_WINDOW, help="janela de agrupamento do servidor local")
+    parser.add_argument("--unix", default=None, metavar="PATH", help="servidor já rodando num socket Unix")
+    parser.add_argument("--host", default=None, help="servidor já rodando em TCP")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    genome = load_champion(args.champion)
+    snapshots = collect_snapshots(genome, args.snapshots, args.seed)
+    elapsed, latency, answers, stats = asyncio.run(run_load(
+        genome, snapshots, args.requests, args.connections, args.pipeline,
+        args.unix, args.host, args.port, args.window))
+
+    # Confere as respostas com o getMove local (só faz sentido se o servidor usa o mesmo genoma)
+    expected, local_rate = expected_decisions(genome, snapshots)
+    mismatches = 0
+    for i, response in answers.items():
+        move, targets = expected[i % len(snapshots)]
+        if response.get("move") != move or response.get("targets") != targets:
+            mismatches += 1
+    print_report(args.requests, elapsed, latency, stats, mismatches, local_rate)
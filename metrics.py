@@ -0,0 +1,87 @@
+import os
+import csv
+import json
+import time
+
+# Métricas do treino, uma linha por geração gravada enquanto o treino roda
+# JSONL (padrão) ou CSV, escolhido pela extensão do arquivo
+# As linhas ficam num buffer e vão pro disco a cada FLUSH_INTERVAL segundos (ou no flush/close)
+# O plot.py lê esse arquivo e desenha o gráfico a qualquer momento, sem precisar esperar o treino acabar
+
+# Campos de cada geração, na ordem das colunas do CSV
+FIELDS = ["gen", "winrate", "max_fitness", "avg_fitness", "multiplier", "mutation_rate", "mutation_sigma",
+          "stagnation", "battles", "cache_hits", "turns_saved", "seconds"]
+FLUSH_INTERVAL = 5.0
+
+def _is_csv(filename):
+    return filename.lower().endswith(".csv")
+
+class MetricsSink:
+    # resume_at: continua um arquivo existente, descartando as gerações >= resume_at (gravadas depois do checkpoint)
+    def __init__(self, filename="metrics.jsonl", resume_at=None, flush_interval=FLUSH_INTERVAL):
+        self.filename = filename
+        self.csv = _is_csv(filename)
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.last_flush = time.monotonic()
+
+        if resume_at is not None and os.path.exists(filename):
+            kept = [r for r in read_records(filename) if r["gen"] < resume_at]
+            self.file = open(filename, "w", newline="")
+            self._header()
+            for record in kept: self.buffer.append(self._line(record))
+            self.flush()
+        else:
+            self.file = open(filename, "w", newline="")
+            self._header()
+
+    def _header(self):
+        if self.csv: self.file.write(",".join(FIELDS) + "\n")
+
+    def _line(self, record):
+        if self.csv:
+            return ",".join("" if record.get(k) is None else repr(record[k]) for k in FIELDS) + "\n"
+        return json.dumps(record) + "\n"
+
+    # Adiciona a linha de uma geração, valores do NumPy viram float/int simples
+    def write(self, record):
+        record = {k: (v.item() if hasattr(v, "item") else v) for k, v in record.items()}
+        self.buffer.append(self._line(record))
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.file.write("".join(self.buffer))
+            self.buffer = []
+        self.file.flush()
+        self.last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+# Lê as linhas de um arquivo de métricas como lista de dicts
+def read_records(filename="metrics.jsonl"):
+    records = []
+    with open(filename, "r", newline="") as f:
+        if _is_csv(filename):
+            for row in csv.DictReader(f):
+                try:
+                    records.append({k: (json.loads(v) if v else None) for k, v in row.items()})
+                except (json.JSONDecodeError, TypeError):
+                    break # Última linha cortada no meio de uma escrita
+        else:
+            for line in f:
+                line = line.strip()
+                if not line: continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break # Última linha cortada no meio de uma escrita
+    return records
+
+# Lê um arquivo de métricas como colunas: campo -> lista de valores
+def read_metrics(filename="metrics.jsonl"):
+    records = read_records(filename)
+    return {k: [r.get(k) for r in records] for k in FIELDS}
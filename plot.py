@@ -0,0 +1,49 @@
+import math
+import argparse
+import matplotlib # type: ignore
+matplotlib.use("Agg") # Só salva o arquivo, não precisa de janela
+import matplotlib.pyplot as plt # type: ignore
+
+from metrics import read_metrics
+
+# Desenha o gráfico do treino a partir do arquivo de métricas
+# Pode rodar a qualquer momento, inclusive com o treino ainda em andamento
+# points: desenha no máximo essa quantidade de pontos por curva (treinos muito longos)
+def plot_metrics(filename="metrics.jsonl", output="resultado_treino.png", points=None):
+    metrics = read_metrics(filename)
+    step = 1
+    if points is not None and len(metrics["gen"]) > points:
+        step = math.ceil(len(metrics["gen"]) / points)
+    gens = metrics["gen"][::step]
+
+    plt.figure(figsize=(12, 8))
+    plt.subplot(3, 1, 1)
+    plt.plot(gens, metrics["max_fitness"][::step], label='Melhor Fitness', color='green')
+    plt.plot(gens, metrics["avg_fitness"][::step], label='Fitness Médio', color='blue')
+    plt.title('Evolução do Fitness')
+    plt.legend()
+    plt.grid(True)
+
+    plt.subplot(3, 1, 2)
+    plt.plot(gens, metrics["winrate"][::step], label='Taxa de Vitória', color='orange')
+    plt.title('Taxa de Vitória')
+    plt.ylim(0, 1.0)
+    plt.grid(True)
+
+    plt.subplot(3, 1, 3)
+    plt.plot(gens, metrics["multiplier"][::step], label='Multiplicador', color='purple')
+    plt.title('Taxa de Mutação')
+    plt.ylim(-2, 17)
+    plt.grid(True)
+
+    plt.savefig(output)
+    plt.close()
+    print(f"Gráfico salvo como: {output}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Desenha o gráfico do treino a partir das métricas")
+    parser.add_argument("metrics", nargs="?", default="metrics.jsonl", help="arquivo de métricas (.jsonl ou .csv)")
+    parser.add_argument("-o", "--output", default="resultado_treino.png", help="imagem de saída")
+    parser.add_argument("--points", type=int, default=None, help="máximo de pontos por curva")
+    args = parser.parse_args()
+    plot_metrics(args.metrics, args.output, args.points)
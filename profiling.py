@@ -0,0 +1,113 @@
+import time
+import functools
+
+import classes
+import metrics
+
+# Instrumentação opcional do treino: tempo e chamadas de cada fase, mais alguns contadores
+# Só existe quando ligada: o enable() troca as funções quentes por versões cronometradas
+# e o disable() devolve as originais, então desligado o custo é zero (nada é verificado por chamada)
+#
+# Fases (tempo inclusivo, as de dentro também contam nas de fora):
+#   battleLoop > requestMove > getMove / applyMove, predict (cérebro do herói),
+#   battle_fitness (inclui a checagem de "morreu burro") > calculate_fitness,
+#   evaluate_population, reproduce, metrics (gravação das métricas)
+# Contadores:
+#   battles, turns (soma dos turnos de cada batalha), genomes (genomas avaliados),
+#   decisions e candidates (pares Golpe/Alvo avaliados pelo cérebro, só no motor "object")
+
+_timers = {} # Nome -> [Chamadas, Segundos]
+_counters = {"battles": 0, "turns": 0, "genomes": 0, "decisions": 0, "candidates": 0}
+_originals = [] # (Dono, Atributo, Valor original) para o disable()
+
+def enabled():
+    return bool(_originals)
+
+# Troca owner.attr por uma versão cronometrada (after(args, result) atualiza contadores)
+def _wrap(owner, attr, name, after=None):
+    raw = owner.__dict__[attr]
+    fn = raw.__func__ if isinstance(raw, (classmethod, staticmethod)) else raw
+    timer = _timers.setdefault(name, [0, 0.0])
+    clock = time.perf_counter
+
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        start = clock()
+        result = fn(*args, **kwargs)
+        timer[0] += 1
+        timer[1] += clock() - start
+        if after is not None: after(args, result)
+        return result
+
+    if isinstance(raw, classmethod): timed = classmethod(timed)
+    elif isinstance(raw, staticmethod): timed = staticmethod(timed)
+    _originals.append((owner, attr, raw))
+    setattr(owner, attr, timed)
+
+def _count_battle(args, result):
+    _counters["battles"] += 1
+    _counters["turns"] += args[0].turn
+
+def _count_batch(args, result):
+    engine = args[0]
+    _counters["battles"] += len(engine.turn)
+    _counters["turns"] += int(engine.turn.sum())
+
+def _count_decision(args, result):
+    _counters["decisions"] += 1
+    _counters["candidates"] += len(result)
+
+def _count_genomes(args, result):
+    _counters["genomes"] += len(args[1])
+
+# Liga a instrumentação. train_module: o módulo do train.py (pode ser o __main__)
+def enable(train_module):
+    if enabled(): return
+    import batch
+    _wrap(classes.BattleManager, "battleLoop", "battleLoop", _count_battle)
+    _wrap(classes.BattleManager, "requestMove", "requestMove")
+    _wrap(classes.BattleManager, "applyMove", "applyMove")
+    _wrap(classes.CombatAlgorithms, "getMove", "getMove")
+    _wrap(classes.AIBrain, "predict_many", "predict", _count_decision)
+    _wrap(batch.BatchBattleManager, "battleLoop", "battleLoop", _count_batch)
+    _wrap(metrics.MetricsSink, "write", "metrics")
+    # Funções do train são chamadas pelo nome global do módulo, trocar no módulo basta
+    for name in ("battle_fitness", "batch_fitness", "calculate_fitness", "reproduce"):
+        _wrap(train_module, name, name)
+    _wrap(train_module, "evaluate_population", "evaluate_population", _count_genomes)
+
+def disable():
+    while _originals:
+        owner, attr, raw = _originals.pop()
+        setattr(owner, attr, raw)
+
+# Retorna o acumulado desde a última coleta e zera tudo
+def collect():
+    data = {"timers": {k: list(v) for k, v in _timers.items()}, "counters": dict(_counters)}
+    for timer in _timers.values():
+        timer[0] = 0
+        timer[1] = 0.0
+    for k in _counters: _counters[k] = 0
+    return data
+
+# Soma o que um processo trabalhador coletou
+def merge(data):
+    for name, (calls, seconds) in data["timers"].items():
+        timer = _timers.setdefault(name, [0, 0.0])
+        timer[0] += calls
+        timer[1] += seconds
+    for k, v in data["counters"].items(): _counters[k] += v
+
+# Linha de uma geração para o arquivo de perfil: tempo/chamadas de cada fase e as médias dos contadores
+def summary(data):
+    record = {}
+    for name, (calls, seconds) in data["timers"].items():
+        if calls == 0: continue
+        record[name + "_calls"] = calls
+        record[name + "_s"] = seconds
+    c = data["counters"]
+    record["battles"] = c["battles"]
+    if c["battles"]: record["turns_per_battle"] = c["turns"] / c["battles"]
+    if c["genomes"]: record["battles_per_genome"] = c["battles"] / c["genomes"]
+    if c["decisions"]: record["candidates_per_decision"] = c["candidates"] / c["decisions"]
+    return record
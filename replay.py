@@ -1,32 +1,41 @@
-import json
+import os
+import math
+import random
+import argparse
 import numpy as np # type: ignore
 
-from classes import BattleManager
+from classes import BattleManager, BOSS_ID
+from genomefile import load_genome
 
 # Observa em tempo real o genoma salvo jogando o RPG
 # Claro, faça o treinamento do genoma anterior
 # No repo estará salvo o output de um treinamento prévio
 
-# Carrega o genoma
-def load_champion(filename="champion.json"):
+# Arquivos do campeão procurados quando nenhum é passado, o binário do train.py primeiro
+CHAMPION_FILES = ("champion.genome", "champion.json")
+
+# Carrega o genoma (binário ou JSON)
+def load_champion(filename=None):
+    if filename is None:
+        filename = next((f for f in CHAMPION_FILES if os.path.exists(f)), CHAMPION_FILES[-1])
     try:
-        with open(filename, "r") as f:
-            data = json.load(f)
-        return np.array(data)
+        return load_genome(filename)
     except FileNotFoundError:
-        print("Erro: Arquivo 'champion.json' não encontrado.")
+        print(f"Erro: Arquivo '{filename}' não encontrado.")
         print("Rode o 'train.py' primeiro para gerar um genoma.")
         exit()
 
 # Carrega o sistema RPG e assiste o genoma jogando
-def watch_mode():
+# delay: pausa entre os turnos em segundos (padrão: TURN_DELAY do classes.py)
+def watch_mode(filename=None, delay=None):
     # 1. Carrega o genoma
-    champion_genome = load_champion()
+    champion_genome = load_champion(filename)
     print("Genoma Carregado")
     
     # 2. Prepara a Arena
     battle = BattleManager(verbose=True) # Ativa prints detalhados
     battle.active_genome = champion_genome # type: ignore
+    if delay is not None: battle.turn_delay = delay
     
     while True:
         print("  NOVA BATALHA DE EXIBIÇÃO  ")
@@ -42,5 +51,162 @@ def watch_mode():
         if user_input == 's':
             break
 
+# Revê batalhas gravadas no treino (TRACE no train.py) direto do registro, sem simular nada
+# Com number mostra a batalha, sem ele lista as batalhas que passam nos filtros
+# champion: só as batalhas desse genoma (o CRC é conferido em float32 e float64, o dtype em que o treino rodou)
+def trace_mode(filename, number=None, delay=None, start_turn=0, outcomes=None, champion=None, limit=50):
+    from battlelog import TraceLog, render_battle, describe, genome_crc, REPLAY_DELAY
+    log = TraceLog(filename)
+    if number is not None:
+        render_battle(log, number, REPLAY_DELAY if delay is None else delay, start_turn)
+        return
+    genomes = None
+    if champion is not None:
+        genome = load_champion(champion)
+        genomes = {genome_crc(np.asarray(genome, dtype=dtype)) for dtype in (np.float32, np.float64)}
+    selected = log.select(outcomes, genomes)
+    for n in selected[:limit]:
+        print(describe(n, log.entries[n]))
+    if len(selected) > limit:
+        print(f"... mais {len(selected) - limit}")
+    print(f"{len(selected)} de {len(log)} batalhas gravadas. Para assistir uma: python replay.py --trace {filename} --battle N")
+
+# Modo benchmark: joga o genoma em velocidade máxima, sem prints nem pausas
+# Mede a taxa real de vitória e as médias de cada tipo de encontro
+
+# Joga uma lista de encontros, retorna por batalha: (Resultado, Turnos, Dano, Cura)
+def play_encounters(genome, encounters, engine="object"):
+    if engine == "batch":
+        from batch import BatchBattleManager
+        battle = BatchBattleManager()
+        outcome, dmg, _, healed = battle.battleLoop(np.array([genome]), encounters, np.zeros(len(encounters), dtype=int))
+        return list(zip(outcome.tolist(), battle.turn.tolist(), dmg.tolist(), healed.tolist()))
+    
+    battle = BattleManager()
+    battle.active_genome = genome # type: ignore
+    results = []
+    for foes in encounters:
+        battle.cleanup()
+        outcome, dmg, _, healed = battle.battleLoop(foes)
+        results.append((outcome, battle.turn, dmg, healed))
+    return results
+
+def _play_chunk(task):
+    return play_encounters(*task)
+
+# Nome do tipo de encontro (Boss ou quantidade de inimigos comuns)
+def encounter_kind(foes):
+    if foes == [BOSS_ID]: return "Boss"
+    return f"{len(foes)} inimigo" + ("s" if len(foes) > 1 else "")
+
+# Intervalo de confiança de Wilson (95%) para uma proporção
+def wilson_interval(successes, n, z=1.96):
+    if n == 0: return 0.0, 0.0
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+# Joga o genoma em battles encontros sorteados (ou em todos os encontros possíveis, pesados pela probabilidade real)
+# Retorna um dict por tipo de encontro (mais o "Total") com as taxas e médias
+def benchmark(genome, battles=1000, exact=False, workers=1, seed=None, engine="object"):
+    if exact:
+        weighted = BattleManager.allEncounters()
+    else:
+        if seed is not None: random.seed(seed)
+        weighted = [(foes, 1.0) for foes in BattleManager.scheduleEncounters(BattleManager.rollSchedule(battles))]
+    encounters = [foes for foes, _ in weighted]
+    
+    if workers > 1:
+        from multiprocessing import Pool
+        chunk = -(-len(encounters) // (workers * 4))
+        tasks = [(genome, encounters[i:i + chunk], engine) for i in range(0, len(encounters), chunk)]
+        with Pool(workers) as pool:
+            results = [r for part in pool.map(_play_chunk, tasks) for r in part]
+    else:
+        results = play_encounters(genome, encounters, engine)
+    
+    # Acumula [Batalhas, Peso, Peso por resultado (Derrota, Empate, Vitoria), Turnos, Dano, Cura] por tipo
+    groups = {}
+    for (foes, weight), (outcome, turns, dmg, healed) in zip(weighted, results):
+        for kind in (encounter_kind(foes), "Total"):
+            g = groups.setdefault(kind, [0, 0.0, [0.0, 0.0, 0.0], 0.0, 0.0, 0.0])
+            g[0] += 1
+            g[1] += weight
+            g[2][outcome + 1] += weight
+            g[3] += weight * turns
+            g[4] += weight * dmg
+            g[5] += weight * healed
+    
+    report = {}
+    for kind, (n, weight, results_by_outcome, turns, dmg, healed) in groups.items():
+        entry = {"battles": n, "weight": weight}
+        for name, k in (("loss", 0), ("draw", 1), ("win", 2)):
+            entry[name] = results_by_outcome[k] / weight
+            # No modo exato a taxa já é a probabilidade real, sem incerteza
+            entry[name + "_ci"] = (entry[name], entry[name]) if exact else wilson_interval(results_by_outcome[k], n)
+        entry["turns"] = turns / weight
+        entry["damage"] = dmg / weight
+        entry["healed"] = healed / weight
+        report[kind] = entry
+    return report
+
+# Joga todos os encontros possíveis com o genoma em float64 e em float32 (GENOME_DTYPE do train.py)
+# As batalhas são determinísticas: uma decisão diferente muda o resultado, os turnos, o dano ou a cura
+# Retorna o total de encontros e os que deram diferente: (Encontro, Resultado float64, Resultado float32)
+def compare_dtypes(genome, engine="object"):
+    encounters = [foes for foes, _ in BattleManager.allEncounters()]
+    reference = play_encounters(np.asarray(genome, dtype=np.float64), encounters, engine)
+    single = play_encounters(np.asarray(genome, dtype=np.float32), encounters, engine)
+    diffs = [(foes, a, b) for foes, a, b in zip(encounters, reference, single) if a != b]
+    return len(encounters), diffs
+
+def print_report(report, exact=False):
+    order = ["Boss"] + [k for k in sorted(report) if k not in ("Boss", "Total")] + ["Total"]
+    print(f"{'Encontro':<12} {'Batalhas':>8} {'Peso':>6} {'Vitória':>22} {'Empate':>22} {'Derrota':>22} {'Turnos':>7} {'Dano':>8} {'Cura':>7}")
+    for kind in order:
+        if kind not in report: continue
+        e = report[kind]
+        rates = []
+        for name in ("win", "draw", "loss"):
+            low, high = e[name + "_ci"]
+            rates.append(f"{e[name]*100:5.1f}% [{low*100:5.1f}-{high*100:5.1f}]")
+        weight = f"{e['weight'] / report['Total']['weight'] * 100:5.1f}%"
+        print(f"{kind:<12} {e['battles']:>8} {weight:>6} {rates[0]:>22} {rates[1]:>22} {rates[2]:>22} {e['turns']:7.1f} {e['damage']:8.1f} {e['healed']:7.1f}")
+    if exact: print("Modo exato: cada encontro possível jogado uma vez e pesado pela probabilidade real")
+    else: print("Intervalos de confiança de 95% (Wilson)")
+
 if __name__ == "__main__":
-    watch_mode()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Assiste o genoma campeão jogando, ou mede o desempenho dele")
+    parser.add_argument("--champion", default=None, help="arquivo do genoma (padrão: champion.genome ou champion.json)")
+    parser.add_argument("--bench", type=int, nargs="?", const=1000, default=None, metavar="N",
+                        help="modo benchmark: joga N batalhas sorteadas sem prints (padrão: 1000)")
+    parser.add_argument("--exact", action="store_true", help="modo benchmark com todos os encontros possíveis")
+    parser.add_argument("--workers", type=int, default=1, help="processos do benchmark")
+    parser.add_argument("--seed", type=int, default=None, help="seed dos encontros sorteados")
+    parser.add_argument("--engine", choices=["object", "batch"], default="object", help="simulador do benchmark")
+    parser.add_argument("--compare-dtype", action="store_true", help="confere se o genoma em float32 joga igual ao float64")
+    parser.add_argument("--delay", type=float, default=None, help="pausa entre os turnos em segundos (0 = sem pausa)")
+    parser.add_argument("--trace", nargs="?", const="battles.trace", default=None, metavar="ARQUIVO",
+                        help="revê batalhas gravadas no treino (padrão: battles.trace)")
+    parser.add_argument("--battle", type=int, default=None, metavar="N", help="batalha do registro para assistir")
+    parser.add_argument("--from-turn", type=int, default=0, metavar="T", help="avança direto até o turno T")
+    parser.add_argument("--outcome", choices=["loss", "draw", "win"], action="append", default=None,
+                        help="lista só as batalhas com esse resultado (pode repetir)")
+    parser.add_argument("--limit", type=int, default=50, help="máximo de batalhas listadas")
+    args = parser.parse_args()
+    
+    if args.trace is not None:
+        outcomes = None if args.outcome is None else [{"loss": -1, "draw": 0, "win": 1}[o] for o in args.outcome]
+        trace_mode(args.trace, args.battle, args.delay, args.from_turn, outcomes, args.champion, args.limit)
+    elif args.compare_dtype:
+        total, diffs = compare_dtypes(load_champion(args.champion), args.engine)
+        for foes, a, b in diffs:
+            print(f"{foes}: float64 {a} | float32 {b}")
+        print(f"{total - len(diffs)}/{total} encontros iguais em float32 e float64")
+    elif args.bench is None and not args.exact:
+        watch_mode(args.champion, args.delay)
+    else:
+        genome = load_champion(args.champion)
+        report = benchmark(genome, args.bench or 1000, args.exact, args.workers, args.seed, args.engine)
+        print_report(report, args.exact)
\ No newline at end of file
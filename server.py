@@ -0,0 +1,278 @@
+import json
+import math
+import time
+import asyncio
+import argparse
+import numpy as np # type: ignore
+
+from classes import AIBrain, CombatAlgorithms, charSheet, moveCosts
+
+# Servidor de decisões do herói treinado, para outros serviços que rodam muitas batalhas ao mesmo tempo
+# Carrega o campeão (champion.genome ou champion.json) uma vez e responde (Golpe, Alvos) para fotos do estado da batalha
+#
+# Protocolo: uma linha JSON por mensagem, em um socket Unix ou TCP (localhost)
+#   Pedido:   {"id": 7, "actor": 0, "state": [dumpStats() de cada personagem, na ordem do charList]}
+#             "actor" é o battleID do herói (padrão: o primeiro herói do estado)
+#             "moves" opcional: golpes disponíveis (padrão: os do personagem que o SP/MP atual pagam)
+#   Resposta: {"id": 7, "move": 3, "targets": [1]} ou {"id": 7, "error": "..."}
+#   {"op": "stats"} devolve os contadores e o histograma de latência do servidor
+#
+# Pedidos que chegam dentro de BATCH_WINDOW segundos são juntados num único forward pass do cérebro
+# Contrapressão: cada conexão tem no máximo MAX_INFLIGHT pedidos sem resposta e a fila geral no máximo
+# MAX_PENDING, quando enchem o servidor para de ler o socket e quem manda fica esperando
+#
+#   python server.py --unix /tmp/heroi.sock
+#   python server.py --port 7777
+#   python loadgen.py               # Mede a vazão contra um servidor local
+
+# Parâmetros do Servidor
+BATCH_WINDOW = 0.002 # Quanto o primeiro pedido espera por outros antes do forward pass (segundos)
+MAX_BATCH = 256 # Máximo de pedidos por forward pass
+MAX_PENDING = 4096 # Máximo de pedidos na fila geral
+MAX_INFLIGHT = 64 # Máximo de pedidos sem resposta por conexão
+HOST = "127.0.0.1"
+PORT = 7777
+MAX_LINE = 1 << 20 # Maior linha aceita (bytes)
+
+# Histograma de latências em baldes logarítmicos (4 por oitava, de 1µs a ~1min)
+# Guarda só as contagens, então custa o mesmo com mil ou um bilhão de pedidos
+class LatencyHistogram:
+    MIN = 1e-6
+    PER_OCTAVE = 4
+    BUCKETS = 104
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        bucket = 0
+        if seconds > self.MIN:
+            bucket = min(self.BUCKETS - 1, int(math.log2(seconds / self.MIN) * self.PER_OCTAVE))
+        self.counts[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max: self.max = seconds
+
+    # Limite superior do balde onde cai o percentil p (0 a 100)
+    def percentile(self, p):
+        if self.count == 0: return 0.0
+        rank = math.ceil(self.count * p / 100)
+        seen = 0
+        for bucket, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.max, self.MIN * 2 ** ((bucket + 1) / self.PER_OCTAVE))
+        return self.max
+
+    # Resumo em milissegundos
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+# Golpes que o personagem consegue pagar com o SP/MP da foto (mesma regra do getMoveList)
+def available_moves(stats):
+    moves = charSheet[stats["typeID"]]["movelist"]
+    return [move for move, spCost, mpCost in moveCosts(moves) if spCost <= stats["SP"] and mpCost <= stats["MP"]]
+
+# Lê um pedido e separa (Herói, Estado, Golpes)
+def parse_request(request):
+    situation = request["state"]
+    if not isinstance(situation, list) or not situation:
+        raise ValueError("'state' precisa ser uma lista com o dumpStats de cada personagem")
+    actor = request.get("actor")
+    if actor is None:
+        actor = next(x["battleID"] for x in situation if x["isHero"])
+    me = next((x for x in situation if x["battleID"] == actor), None)
+    if me is None or not me["isHero"]:
+        raise ValueError(f"'actor' {actor} não é um herói do estado")
+    moves = request.get("moves")
+    if moves is None: moves = available_moves(me)
+    if not moves:
+        raise ValueError("O herói não tem golpes disponíveis")
+    return actor, situation, list(moves)
+
+# Decide vários pedidos (Herói, Estado, Golpes) com um único forward pass do cérebro
+# Mesmo resultado do CombatAlgorithms.getMove para cada um
+def decide_batch(brain, requests):
+    prepared = []
+    inputs = []
+    for actor, situation, moves in requests:
+        me, enemies, cand_ids, cand_targets = CombatAlgorithms.heroCandidates(actor, True, situation, moves)
+        prepared.append((enemies, cand_ids, cand_targets, moves))
+        if cand_ids: inputs.append(CombatAlgorithms.get_turn_inputs(me, cand_targets, cand_ids, situation))
+    scores = brain.predict_many(np.concatenate(inputs)) if inputs else None
+
+    decisions = []
+    offset = 0
+    for enemies, cand_ids, cand_targets, moves in prepared:
+        if not cand_ids:
+            decisions.append((moves[0], []))
+            continue
+        decisions.append(CombatAlgorithms.pickCandidate(scores[offset:offset + len(cand_ids)], cand_ids, cand_targets, enemies, moves))
+        offset += len(cand_ids)
+    return decisions
+
+class DecisionServer:
+    def __init__(self, genome, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH,
+                 max_pending=MAX_PENDING, max_inflight=MAX_INFLIGHT):
+        self.brain = AIBrain(genome)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.max_inflight = max_inflight
+        self.queue = None # Criada dentro do loop do asyncio
+        self.latency = LatencyHistogram() # Da chegada do pedido até a resposta pronta
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.server = None
+        self.connections = set() # Tarefas das conexões abertas
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "avg_batch": self.requests / self.batches if self.batches else 0.0,
+            "pending": self.queue.qsize() if self.queue is not None else 0,
+            "latency": self.latency.summary(),
+        }
+
+    # Junta os pedidos que chegaram dentro da janela e decide todos de uma vez
+    async def _batcher(self):
+        while True:
+            batch = [await self.queue.get()]
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        self.batches += 1
+        try:
+            decisions = decide_batch(self.brain, [job[1] for job in batch])
+        except Exception: # Um pedido com estado inválido não derruba os outros do lote
+            decisions = []
+            for job in batch:
+                try:
+                    decisions.extend(decide_batch(self.brain, [job[1]]))
+                except Exception as single:
+                    self.errors += 1
+                    decisions.append(ValueError(f"Estado inválido: {type(single).__name__} {single}"))
+        now = time.perf_counter()
+        for (arrival, _, future), decision in zip(batch, decisions):
+            self.latency.record(now - arrival)
+            if not future.done(): future.set_result(decision)
+
+    async def _handle(self, reader, writer):
+        inflight = asyncio.Queue(self.max_inflight) # Respostas pendentes, na ordem dos pedidos
+        responder = asyncio.ensure_future(self._respond(inflight, writer))
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line: break
+                arrival = time.perf_counter()
+                future = loop.create_future()
+                request_id = None
+                try:
+                    request = json.loads(line)
+                    request_id = request.get("id")
+                    if request.get("op") == "stats":
+                        future.set_result(self.stats())
+                    else:
+                        job = parse_request(request)
+                        self.requests += 1
+                        await self.queue.put((arrival, job, future)) # Espera se a fila geral estiver cheia
+                except (ValueError, KeyError, TypeError, AttributeError, StopIteration) as e:
+                    self.errors += 1
+                    future.set_result(ValueError(f"Pedido inválido: {e}"))
+                await inflight.put((request_id, future)) # Espera se a conexão tiver pedidos demais sem resposta
+            # Fim da leitura, responde o que ainda falta
+            await inflight.put(None)
+            await responder
+        except (ConnectionError, ValueError): # Conexão caiu ou linha maior que MAX_LINE
+            pass
+        except asyncio.CancelledError: # Servidor fechando (close), a conexão termina sem erro
+            pass
+        finally:
+            responder.cancel()
+            self.connections.discard(task)
+            writer.close()
+
+    async def _respond(self, inflight, writer):
+        while True:
+            item = await inflight.get()
+            if item is None: return
+            request_id, future = item
+            result = await future
+            if isinstance(result, Exception):
+                response = {"id": request_id, "error": str(result)}
+            elif isinstance(result, dict):
+                response = {"id": request_id, **result}
+            else:
+                move, targets = result
+                response = {"id": request_id, "move": int(move), "targets": [int(t) for t in targets]}
+            try:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+            except ConnectionError:
+                pass # Quem pediu já foi embora, só esvazia a fila
+
+    # Abre o socket (Unix se path for passado, senão TCP) e começa a servir
+    async def start(self, path=None, host=HOST, port=PORT):
+        self.queue = asyncio.Queue(self.max_pending)
+        self._batch_task = asyncio.ensure_future(self._batcher())
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path, limit=MAX_LINE)
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port, limit=MAX_LINE)
+        return self.server
+
+    # Para de aceitar conexões e dá um tempo para as abertas terminarem, as que sobrarem são canceladas
+    async def close(self, timeout=1.0):
+        self.server.close()
+        if self.connections:
+            await asyncio.wait(list(self.connections), timeout=timeout)
+        remaining = list(self.connections)
+        for task in remaining: task.cancel()
+        await asyncio.gather(*remaining, return_exceptions=True)
+        await self.server.wait_closed()
+        self._batch_task.cancel()
+        await asyncio.gather(self._batch_task, return_exceptions=True)
+
+async def serve(genome, path=None, host=HOST, port=PORT, batch_window=BATCH_WINDOW):
+    server = DecisionServer(genome, batch_window)
+    await server.start(path, host, port)
+    where = path if path is not None else f"{host}:{port}"
+    print(f"Servidor de decisões em {where} (janela {server.batch_window * 1000:.1f}ms, lote até {server.max_batch})")
+    try:
+        await server.server.serve_forever()
+    finally:
+        print(json.dumps(server.stats(), indent=2))
+
+if __name__ == "__main__":
+    from replay import load_champion
+    parser = argparse.ArgumentParser(description="Servidor de decisões do herói treinado")
+    parser.add_argument("--champion", default=None, help="genoma servido (padrão: champion.genome ou champion.json)")
+    parser.add_argument("--unix", default=None, metavar="PATH", help="socket Unix (padrão: TCP)")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--window", type=float, default=BATCH_WINDOW, help="janela de agrupamento em segundos")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(load_champion(args.champion), args.unix, args.host, args.port, args.window))
+    except KeyboardInterrupt:
+        pass
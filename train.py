@@ -1,9 +1,18 @@
-import json
+import os
+import sys
+import time
 import random
+import argparse
+import hashlib
+from collections import OrderedDict
 import numpy as np # type: ignore
-import matplotlib.pyplot as plt # type: ignore
 
 from classes import *
+from metrics import MetricsSink
+from genomefile import write_genome, export_json
+import profiling
+# Os módulos opcionais (multiprocessing, batch, lineage, cProfile, subprocess) só são importados
+# quando a opção que usa eles está ligada, pra abrir processos novos ser rápido
 
 # Código de Treinamento do modelo
 # Treina do zero por X Gerações com população Y cada
@@ -20,20 +29,77 @@ DELTA_P = 25.0 # Diferença mínima de fitness exigida para não considerar esta
 BASE_MUTATION_RATE = 0.1 # Taxa base de mutação
 BASE_MUTATION_SIGMA = 0.2 # Sigma base de mutação
 FRACTION = 2 # Qual fração 1/FRACTION dos top melhores genomas será passado adiante
-
-# Lê o moveList
-with open('movelist.json', 'r') as f:
-    moveSheet = json.load(f)
-f.close()
+ELITES = 3 # Quantos dos melhores genomas passam intocados para a próxima geração
+SELECTION = "truncation" # Como os pais são escolhidos
+                         # "truncation": sorteio uniforme entre o top 1/FRACTION
+                         # "tournament": o melhor entre TOURNAMENT_SIZE sorteados da população inteira
+TOURNAMENT_SIZE = 3
+EVAL_MODE = "sample" # Como o fitness de um genoma é medido
+                     # "sample": NUM_TESTS batalhas com encontros sorteados (estimativa ruidosa)
+                     # "exact": Cada encontro possível é jogado uma vez e pesado pela sua probabilidade real
+                     #          (Fitness esperado exato, a batalha é determinística dado o encontro)
+                     # "common": NUM_TESTS encontros sorteados uma vez por geração e enfrentados por todos os genomas
+                     #           (Números aleatórios comuns: a diferença de fitness vem do genoma e não da sorte)
+ENGINE = "object" # Qual simulador de batalhas usar
+                  # "object": BattleManager, uma batalha por vez
+                  # "batch": BatchBattleManager, todas as batalhas da geração de uma vez em arrays (mesmos resultados)
+WORKERS = 1 # Quantos processos avaliam a população em paralelo (1 = tudo no processo principal)
+RACING = False # Avaliação por corrida (successive halving), só nos modos "sample" e "common"
+              # Genomas ruins são cortados cedo e não gastam batalhas à toa
+RACING_RUNGS = [4, 4, 6, 6] # Batalhas extras jogadas pelos sobreviventes em cada degrau
+RACING_KEEP = 0.5 # Fração dos sobreviventes mantida a cada corte
+RACING_BUDGET = None # Máximo de batalhas por geração (None = POPULATION_SIZE * NUM_TESTS)
+RACING_MAX_SE = 0.6 # Erro padrão máximo do fitness médio para considerar o ranking confiável,
+                    # como fração do desvio padrão do fitness médio entre os genomas da geração
+                    # (o fitness de uma batalha varia na casa das centenas, um valor absoluto nunca dispararia)
+FITNESS_CACHE = False # Memoriza o fitness de genomas já vistos (elites e filhos idênticos a um dos pais)
+                      # Um genoma conhecido só completa a amostra ao invés de começar do zero
+                      # Desligado no modo "common": a média acumulada viria de cronogramas de outras gerações
+                      # e desfaria o pareamento de todos os genomas nos mesmos encontros
+FITNESS_CACHE_SIZE = 1000 # Quantos genomas o cache guarda, descarta os usados há mais tempo
+CACHE_TOPUP = 5 # Batalhas extras jogadas por geração por um genoma já conhecido
+CACHE_MAX_BATTLES = 100 # Genomas com essa quantidade de batalhas no cache param de jogar
+MASTER_SEED = None # Seed mestre do treino. Com ela cada genoma recebe sua própria seed derivada
+                   # e o campeão final é o mesmo não importa o número de WORKERS
+CHECKPOINT_EVERY = 100 # A cada quantas gerações salvar um checkpoint (0 = nunca)
+CHECKPOINT_FILE = "checkpoint.npz" # Continue de onde parou com: python train.py --resume
+ARCHIVE = False # Grava a população e o fitness de todas as gerações em ARCHIVE_FILE (leia com o lineage.py)
+ARCHIVE_FILE = "lineage.bin"
+METRICS_FILE = "metrics.jsonl" # Métricas de cada geração, gravadas durante o treino (.jsonl ou .csv)
+PLOT_AT_END = True # Gera o resultado_treino.png no fim (o plot.py roda em outro processo, o treino não carrega o matplotlib)
+                   # O gráfico também pode ser gerado a qualquer momento com: python plot.py
+PROFILE = False # Mede o tempo de cada fase (battleLoop, requestMove, getMove, fitness, reprodução...)
+                # e grava um resumo por geração em PROFILE_FILE. Desligado não custa nada
+PROFILE_FILE = "profile.jsonl"
+PROFILE_GENERATION = None # Roda o cProfile inteiro nesta geração e salva em profile_gen<N>.prof
+TRACE = False # Grava batalhas do treino em TRACE_FILE, ação por ação (só no ENGINE "object")
+              # Reveja qualquer uma sem simular de novo com: python replay.py --trace battles.trace
+TRACE_FILE = "battles.trace"
+TRACE_EVERY = 100 # Grava 1 de cada TRACE_EVERY batalhas (as outras não pagam nada)
+TRACE_OUTCOMES = None # Só guarda batalhas com esses resultados, ex: (-1, 0) para derrotas e empates
+GENOME_DTYPE = "float64" # Tipo dos genomas da população e das contas do cérebro
+                         # "float32": metade da memória (população, checkpoint, cache) e das contas da rede
+                         # Confira se as decisões batem com as do float64 com: python replay.py --compare-dtype
+CHAMPION_FILE = "champion.genome" # Onde o melhor genoma do fim do treino é salvo (binário, veja o genomefile.py)
+CHAMPION_JSON = True # Exporta também o campeão em JSON (champion.json), a lista de floats de sempre
 
 # Salva o melhor output encontrado do treinamento
 # O genoma pode ser utilizado no replay.py para ver ele em ação
-def save_genome(genome, filename="champion.json"):
-    data = genome.tolist()
-    with open(filename, "w") as f:
-        json.dump(data, f)
+# Arquivos .json são a lista de floats, o resto vai no formato binário (com geração e fitness no cabeçalho)
+def save_genome(genome, filename="champion.genome", generation=None, fitness=None):
+    if filename.endswith(".json"):
+        export_json(genome, filename)
+    else:
+        write_genome(filename, genome, generation, fitness)
     print(f"Genoma salvo em: {filename}")
 
+# Salva o campeão no CHAMPION_FILE e, com CHAMPION_JSON, também a cópia em JSON ao lado
+def save_champion(genome, filename, generation=None, fitness=None):
+    save_genome(genome, filename, generation, fitness)
+    json_file = os.path.splitext(filename)[0] + ".json"
+    if CHAMPION_JSON and json_file != filename:
+        save_genome(genome, json_file)
+
 # A eficiência de um genoma de acordo com as métricas de batalha
 # Maior = Melhor
 def calculate_fitness(outcome, turns, hero_hp_pct, damage_dealt_total, enemy_max_hp_total, hero_died_with_resources, effective_heal_total):
@@ -57,6 +123,436 @@ def calculate_fitness(outcome, turns, hero_hp_pct, damage_dealt_total, enemy_max
     return max(0, fitness)
 
 
+# Fitness de uma batalha recém terminada
+def battle_fitness(battle, outcome, dmg, foeMaxHP, totalHealed):
+    hero = battle.charList[0] 
+    died_dumb = False # Não se curou e morreu por causa disto
+    if outcome == -1: # Se morreu
+        # Verifica se tinha algum move de cura (Target=1, Type=2) 
+        # E se tinha SP/MP pra usar tal move
+        has_heal_move = False
+        for m_id in hero.moveList:
+            m_data = moveSheet[m_id]
+            if m_data['Target'] == 1 and m_data['Type'] == 2: # É cura
+                 if hero.curSP >= m_data['SPCost'] and hero.curMP >= m_data['MPCost']:
+                     has_heal_move = True
+                     break
+        if has_heal_move: # Se tinha, marca o genoma como "idiota"
+            died_dumb = True
+    
+    hero_hp_pct = hero.curHP / hero.stats['HP'] # % de vida restante
+    turns = battle.turn # Total de turnos
+    
+    # Obtém o fitness da batalha
+    return calculate_fitness(outcome, turns, hero_hp_pct, dmg, foeMaxHP, died_dumb, totalHealed)
+
+# Avalia um genoma, retorna o fitness médio (ou esperado), o tally [Derrota, Empate, Vitoria] e o fitness de cada batalha
+# No modo "exact" o tally guarda a massa de probabilidade de cada resultado ao invés da contagem
+# seed: se passada, os encontros do genoma são sorteados a partir dela (independe de quem roda antes)
+# rounds: quantas batalhas sorteadas jogar (padrão: NUM_TESTS)
+def evaluate_genome(battle, genome, encounters=None, seed=None, rounds=None):
+    battle.active_genome = genome  # type: ignore
+    tally = [0,0,0]
+    total_fit = 0
+    fits = []
+    
+    if encounters is not None: # Encontros definidos (modos "exact" e "common")
+        for foes, chance in encounters:
+            battle.cleanup() 
+            outcome, dmg, foeMaxHP, totalHealed = battle.battleLoop(foes)
+            tally[outcome + 1] += chance
+            fits.append(battle_fitness(battle, outcome, dmg, foeMaxHP, totalHealed))
+            total_fit += chance * fits[-1]
+        return total_fit, tally, fits
+    
+    if rounds is None: rounds = NUM_TESTS
+    if seed is not None: random.seed(seed)
+    # Loop de batalhas
+    for _ in range(rounds):
+        battle.cleanup() 
+        outcome, dmg, foeMaxHP, totalHealed = battle.battleLoop()
+        tally[outcome + 1] += 1
+        fits.append(battle_fitness(battle, outcome, dmg, foeMaxHP, totalHealed))
+        total_fit += fits[-1]
+    return total_fit / rounds, tally, fits
+
+# Fitness de cada batalha do motor em lote, mesmas regras do battle_fitness
+def batch_fitness(engine, outcome, dmg, foeMaxHP, totalHealed):
+    heal_moves = [moveSheet[m] for m in HEAL_MOVES[engine.hero_id]]
+    fits = []
+    for i in range(len(outcome)):
+        died_dumb = False
+        if outcome[i] == -1:
+            for m_data in heal_moves:
+                if engine.SP[i, 0] >= m_data['SPCost'] and engine.MP[i, 0] >= m_data['MPCost']:
+                    died_dumb = True
+                    break
+        hero_hp_pct = engine.HP[i, 0] / engine.maxHP[i, 0]
+        fits.append(calculate_fitness(outcome[i], engine.turn[i], hero_hp_pct, dmg[i], foeMaxHP[i], died_dumb, totalHealed[i]))
+    return fits
+
+# Avalia um pedaço da população, retorna o fitness, o tally e o fitness de cada batalha de cada genoma
+# seeds: uma seed por genoma (ou None para usar o estado global do random)
+def evaluate_population(battle, population, encounters=None, seeds=None, rounds=None):
+    generation_fitness = []
+    tallies = []
+    battle_fits = []
+    if rounds is None: rounds = NUM_TESTS
+    
+    if ENGINE == "batch": # Todas as batalhas de uma vez
+        if encounters is not None: rounds = len(encounters)
+        members = np.repeat(np.arange(len(population)), rounds) # Qual genoma joga cada batalha
+        foes = None
+        if encounters is not None:
+            foes = [f for f, _ in encounters] * len(population)
+        elif seeds is not None: # Mesmos encontros que o evaluate_genome sortearia com cada seed
+            foes = []
+            for seed in seeds:
+                random.seed(seed)
+                foes.extend(BattleManager.rollEncounter() for _ in range(rounds))
+        outcome, dmg, foeMaxHP, totalHealed = battle.battleLoop(np.array(population), foes, members)
+        fits = batch_fitness(battle, outcome, dmg, foeMaxHP, totalHealed)
+        
+        for i in range(len(population)):
+            total_fit = 0
+            genome_tally = [0,0,0]
+            for k in range(rounds):
+                result = outcome[i * rounds + k]
+                chance = encounters[k][1] if encounters is not None else 1
+                genome_tally[result + 1] += chance
+                total_fit += chance * fits[i * rounds + k]
+            tallies.append(genome_tally)
+            battle_fits.append(fits[i * rounds:(i + 1) * rounds])
+            generation_fitness.append(total_fit if encounters is not None else total_fit / rounds)
+        return generation_fitness, tallies, battle_fits
+    
+    # Loop populacional
+    for i, genome in enumerate(population):
+        avg_fitness, genome_tally, fits = evaluate_genome(battle, genome, encounters, seeds[i] if seeds is not None else None, rounds)
+        tallies.append(genome_tally)
+        battle_fits.append(fits)
+        generation_fitness.append(avg_fitness)
+    return generation_fitness, tallies, battle_fits
+
+# Uma seed por genoma, derivada só da seed mestre, da geração e da posição do genoma
+# Assim o resultado é o mesmo não importa quantos processos dividem o trabalho
+# Cada degrau da avaliação por corrida (rung) ganha seeds próprias
+def genome_seeds(master_seed, gen, count, rung=None):
+    entropy = [master_seed, gen] if rung is None else [master_seed, gen, rung]
+    return np.random.SeedSequence(entropy).generate_state(count).tolist()
+
+# Simulador escolhido no ENGINE
+def make_battle(verbose=False):
+    if ENGINE == "batch":
+        from batch import BatchBattleManager
+        return BatchBattleManager()
+    return BattleManager(verbose=verbose)
+
+# Estado de cada processo trabalhador: um BattleManager "quente" e a população em memória compartilhada
+_worker = {}
+
+def _init_worker(shm_name, shape, dtype, encounters):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _worker["shm"] = shm # Mantém a referência viva
+    _worker["population"] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    _worker["battle"] = make_battle()
+    _worker["encounters"] = encounters
+    if PROFILE:
+        profiling.enable(sys.modules[__name__])
+        profiling.collect() # Descarta o que veio do processo pai
+    if TRACE:
+        from battlelog import BattleRecorder
+        _worker["battle"].recorder = BattleRecorder(None, TRACE_EVERY, TRACE_OUTCOMES) # Na memória, o processo principal grava
+
+# Tarefa de um trabalhador: só os índices viajam, os genomas são lidos da memória compartilhada
+# Devolve também os turnos que a detecção de ciclos pulou neste pedaço, o perfil coletado (PROFILE)
+# e as batalhas gravadas (TRACE)
+# trace_start: número da primeira batalha do pedaço no contador do gravador do processo principal
+def _evaluate_chunk(task):
+    indices, seeds, schedule, rounds, trace_start = task
+    battle = _worker["battle"]
+    if trace_start is not None: battle.recorder.seen = trace_start
+    population = [_worker["population"][i] for i in indices]
+    encounters = schedule_encounters(schedule) if schedule is not None else _worker["encounters"]
+    saved = battle.turns_saved
+    result = evaluate_population(battle, population, encounters, seeds, rounds)
+    trace = battle.recorder.collect() if getattr(battle, "recorder", None) is not None else None
+    return result, battle.turns_saved - saved, profiling.collect() if PROFILE else None, trace
+
+# Encontros de peso igual a partir do cronograma compacto da geração (modo "common")
+def schedule_encounters(schedule):
+    return [(foes, 1.0 / len(schedule)) for foes in BattleManager.scheduleEncounters(schedule)]
+
+# Avalia a geração (ou só os genomas em indices), dividindo em pedaços entre os processos se houver um pool
+# Com pool, a população já deve estar escrita na memória compartilhada
+# Os turnos pulados pelos trabalhadores são somados no battle.turns_saved local
+# e as batalhas que eles gravaram vão pro battle.recorder local
+# Cada pedaço começa o contador do gravador de onde um processo só estaria, então as batalhas gravadas
+# são as mesmas não importa quantos processos dividem o trabalho nem qual deles pega cada pedaço
+# schedule: cronograma de encontros da geração no modo "common", todos os genomas enfrentam o mesmo
+def evaluate_generation(battle, pool, population, encounters, seeds, schedule=None, rounds=None, indices=None):
+    if indices is None: indices = list(range(len(population)))
+    
+    if pool is None:
+        subset = [population[i] for i in indices]
+        if schedule is not None:
+            return evaluate_population(battle, subset, schedule_encounters(schedule))
+        if seeds is None:
+            return evaluate_population(battle, subset, encounters, rounds=rounds)
+        # As seeds por genoma não podem mexer no random da reprodução, igual a quando roda em outro processo
+        state = random.getstate()
+        result = evaluate_population(battle, subset, encounters, seeds, rounds)
+        random.setstate(state)
+        return result
+    
+    recorder = getattr(battle, "recorder", None)
+    if schedule is not None: per_genome = len(schedule)
+    elif encounters is not None: per_genome = len(encounters)
+    else: per_genome = rounds if rounds is not None else NUM_TESTS
+    
+    chunk = -(-len(indices) // (WORKERS * 4)) # Pedaços menores equilibram a carga
+    tasks = []
+    for start in range(0, len(indices), chunk):
+        end = min(start + chunk, len(indices))
+        trace_start = recorder.seen + start * per_genome if recorder is not None else None
+        tasks.append((indices[start:end], seeds[start:end] if seeds is not None else None, schedule, rounds, trace_start))
+    if recorder is not None: recorder.seen += len(indices) * per_genome
+    
+    generation_fitness = []
+    tallies = []
+    battle_fits = []
+    for (chunk_fitness, chunk_tallies, chunk_fits), saved, profile, trace in pool.map(_evaluate_chunk, tasks):
+        battle.turns_saved += saved
+        if profile is not None: profiling.merge(profile)
+        if trace is not None: battle.recorder.merge(trace)
+        generation_fitness.extend(chunk_fitness)
+        tallies.extend(chunk_tallies)
+        battle_fits.extend(chunk_fits)
+    return generation_fitness, tallies, battle_fits
+
+# Cache de fitness por conteúdo do genoma, com estatísticas acumuladas de cada um
+# Cada entrada: [Batalhas, Soma do fitness, [Derrotas, Empates, Vitorias]]
+# No modo "exact" a entrada guarda uma avaliação só (fitness esperado e massa de probabilidade)
+class FitnessCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.lookups = 0
+    
+    @staticmethod
+    def key(genome):
+        return hashlib.blake2b(np.asarray(genome).tobytes(), digest_size=16).digest()
+    
+    # Procura o genoma, contando acertos para o log
+    def get(self, genome):
+        self.lookups += 1
+        key = self.key(genome)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return entry
+    
+    # Soma mais batalhas nas estatísticas do genoma
+    def add(self, genome, battles, fit_sum, tally):
+        key = self.key(genome)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = [0, 0, [0,0,0]]
+            self.entries[key] = entry
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False) # Descarta o usado há mais tempo
+        entry[0] += battles
+        entry[1] += fit_sum
+        for k in range(3): entry[2][k] += tally[k]
+        self.entries.move_to_end(key)
+        return entry
+    
+    def reset_counters(self):
+        self.hits = 0
+        self.lookups = 0
+    
+    # Entradas como arrays para o checkpoint, na ordem de uso (a mais antiga primeiro)
+    def to_arrays(self):
+        keys = np.frombuffer(b"".join(self.entries.keys()), dtype=np.uint8).reshape(-1, 16)
+        values = list(self.entries.values())
+        battles = np.array([entry[0] for entry in values], dtype=np.int64)
+        fit_sums = np.array([entry[1] for entry in values], dtype=np.float64)
+        tallies = np.array([entry[2] for entry in values], dtype=np.float64).reshape(-1, 3)
+        return {"cache_keys": keys, "cache_battles": battles, "cache_fit_sums": fit_sums, "cache_tallies": tallies}
+    
+    def load_arrays(self, data):
+        self.entries = OrderedDict()
+        for key, battles, fit_sum, tally in zip(data["cache_keys"], data["cache_battles"],
+                                                data["cache_fit_sums"], data["cache_tallies"]):
+            self.entries[key.tobytes()] = [int(battles), float(fit_sum), tally.tolist()]
+
+# Avaliação com cache de fitness
+# Genomas novos jogam NUM_TESTS batalhas, os já conhecidos só CACHE_TOPUP (até CACHE_MAX_BATTLES)
+# No modo "exact" o resultado já é exato, então genomas conhecidos não jogam nada
+def cached_evaluation(cache, battle, pool, population, encounters, seeds):
+    entries = [cache.get(genome) for genome in population]
+    fresh = [i for i, entry in enumerate(entries) if entry is None]
+    known = []
+    if encounters is None:
+        known = [i for i, entry in enumerate(entries) if entry is not None and entry[0] < CACHE_MAX_BATTLES]
+    
+    for indices, rounds in ((fresh, NUM_TESTS), (known, CACHE_TOPUP)):
+        if not indices: continue
+        group_seeds = [seeds[i] for i in indices] if seeds is not None else None
+        group_fitness, tallies, fits = evaluate_generation(battle, pool, population, encounters, group_seeds,
+                                                           rounds=rounds, indices=indices)
+        for i, fitness, genome_tally, genome_fits in zip(indices, group_fitness, tallies, fits):
+            if encounters is not None: # Avaliação exata, uma entrada só
+                entries[i] = cache.add(population[i], 1, fitness, genome_tally)
+            else:
+                entries[i] = cache.add(population[i], len(genome_fits), sum(genome_fits), genome_tally)
+    
+    # Fitness médio acumulado e tally com a taxa de cada genoma (cada genoma pesa igual)
+    generation_fitness = [entry[1] / entry[0] for entry in entries]
+    tally = [0,0,0]
+    for entry in entries:
+        total = sum(entry[2])
+        for k in range(3): tally[k] += entry[2][k] / total
+    return generation_fitness, tally
+
+# Avaliação por corrida (successive halving)
+# Cada degrau joga mais algumas batalhas só com os sobreviventes e corta os piores pelo fitness médio
+# Para quando só sobram os 1/FRACTION que serão selecionados e todos já têm erro padrão <= RACING_MAX_SE
+# vezes o desvio padrão do fitness médio da geração
+# Retorna o fitness médio de cada genoma, o fitness de seleção, o tally, a ordem de seleção (sobreviventes primeiro)
+# e as batalhas jogadas
+# O fitness médio vai pro log e pra estagnação; o de seleção só ordena a reprodução: nele os cortados ficam sempre
+# abaixo de quem passou do degrau deles, a média de poucas batalhas de um cortado com sorte não ganha o torneio
+def race_generation(battle, pool, population, master_seed, gen):
+    size = len(population)
+    top_n = int(size / FRACTION)
+    battles = np.zeros(size)
+    sums = np.zeros(size)
+    squares = np.zeros(size)
+    tally = [0,0,0]
+    alive = list(range(size))
+    eliminated = [] # Grupos cortados em cada degrau, do primeiro ao último
+    used = 0
+    budget = RACING_BUDGET if RACING_BUDGET is not None else size * NUM_TESTS
+    
+    for rung, rounds in enumerate(RACING_RUNGS):
+        if rung > 0 and used + rounds * len(alive) > budget: break # Acabou o orçamento
+        
+        seeds = None
+        if master_seed is not None:
+            rung_seeds = genome_seeds(master_seed, gen, size, rung)
+            seeds = [rung_seeds[i] for i in alive]
+        schedule = BattleManager.rollSchedule(rounds) if EVAL_MODE == "common" else None
+        _, tallies, fits = evaluate_generation(battle, pool, population, None, seeds, schedule, rounds, alive)
+        used += rounds * len(alive)
+        
+        # Estatísticas acumuladas de cada sobrevivente
+        for i, genome_tally, genome_fits in zip(alive, tallies, fits):
+            battles[i] += len(genome_fits)
+            sums[i] += sum(genome_fits)
+            squares[i] += sum(f * f for f in genome_fits)
+            mass = sum(genome_tally) # No modo "common" o tally é massa de probabilidade, volta para contagem
+            for k in range(3): tally[k] += genome_tally[k] * len(genome_fits) / mass
+        means = sums / np.maximum(battles, 1)
+        
+        # Confiança: erro padrão da média de cada sobrevivente
+        variance = np.maximum(squares / np.maximum(battles, 1) - means ** 2, 0)
+        stderr = np.sqrt(variance / np.maximum(battles, 1))
+        if rung == len(RACING_RUNGS) - 1: break
+        if len(alive) <= top_n and stderr[alive].max() <= RACING_MAX_SE * np.std(means): break
+        
+        # Corte dos piores, nunca abaixo dos que serão selecionados
+        keep = max(top_n, int(np.ceil(len(alive) * RACING_KEEP)))
+        ranked = sorted(alive, key=lambda i: means[i], reverse=True)
+        eliminated.append(ranked[keep:])
+        alive = ranked[:keep]
+    
+    # Ordem de seleção: sobreviventes pelo fitness, depois os cortados mais tarde antes dos cortados mais cedo
+    order = sorted(alive, key=lambda i: means[i], reverse=True)
+    for group in reversed(eliminated):
+        order.extend(sorted(group, key=lambda i: means[i], reverse=True))
+    
+    # Fitness de seleção: os sobreviventes ficam com a média final, cada grupo cortado fica logo abaixo
+    # do pior de quem foi mais longe (a ordem entre eles continua pela própria média)
+    fitness = means.copy()
+    ceiling = means[alive].min()
+    for group in reversed(eliminated):
+        if not group: continue
+        ceiling = np.nextafter(ceiling, -np.inf)
+        fitness[group] = np.minimum(means[group], ceiling)
+        ceiling = fitness[group].min()
+    return list(means), list(fitness), tally, np.array(order), used
+
+# Checkpoint do treino: tudo que o loop geracional carrega de uma geração pra outra
+# state: dict de valores/arrays (população, históricos, contadores...), mais o estado dos dois geradores aleatórios
+# Gravado num arquivo temporário e renomeado, então um crash no meio nunca deixa um checkpoint quebrado
+def save_checkpoint(filename, state, cache=None):
+    arrays = dict(state)
+    version, internal, gauss = random.getstate()
+    arrays["py_random"] = np.array(internal, dtype=np.uint32)
+    arrays["py_random_extra"] = np.array([version, np.nan if gauss is None else gauss])
+    _, keys, pos, has_gauss, cached_gauss = np.random.get_state()
+    arrays["np_random"] = keys
+    arrays["np_random_extra"] = np.array([pos, has_gauss, cached_gauss])
+    if cache is not None: arrays.update(cache.to_arrays())
+    
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez_compressed(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, filename)
+
+# Lê um checkpoint e restaura os geradores aleatórios, retorna o dict com o resto
+def load_checkpoint(filename, cache=None):
+    with np.load(filename) as data:
+        state = {name: data[name] for name in data.files}
+    
+    version, gauss = state.pop("py_random_extra")
+    random.setstate((int(version), tuple(int(x) for x in state.pop("py_random")), None if np.isnan(gauss) else float(gauss)))
+    pos, has_gauss, cached_gauss = state.pop("np_random_extra")
+    np.random.set_state(("MT19937", state.pop("np_random"), int(pos), int(has_gauss), float(cached_gauss)))
+    if cache is not None and "cache_keys" in state: cache.load_arrays(state)
+    return state
+
+# Gera a próxima geração inteira em new_pop, com operações de array ao invés de um filho por vez
+# sorted_indices: população ordenada do melhor para o pior
+def reproduce(population, new_pop, sorted_indices, generation_fitness, mutation_rate, mutation_sigma):
+    size, genome_size = population.shape
+    
+    # Elitismo: Top 3 serão preservados
+    new_pop[:ELITES] = population[sorted_indices[:ELITES]]
+    n_children = size - ELITES
+    
+    # Seleção dos pais
+    if SELECTION == "tournament": # Melhor de TOURNAMENT_SIZE sorteados da população toda
+        fitness = np.asarray(generation_fitness)
+        contenders = np.random.randint(0, size, (2 * n_children, TOURNAMENT_SIZE))
+        winners = contenders[np.arange(2 * n_children), np.argmax(fitness[contenders], axis=1)]
+        idx_p1, idx_p2 = winners[:n_children], winners[n_children:]
+    else: # Truncamento: os melhores da fração 1/FRACTION serão guardados
+        # Ex: FRACTION = 2, .°. top 50% será passado adiante e o resto cortado fora
+        top_half_indices = np.asarray(sorted_indices[:int(size/FRACTION)])
+        idx_p1 = np.random.choice(top_half_indices, n_children)
+        idx_p2 = np.random.choice(top_half_indices, n_children)
+    
+    # Crossbreeding de um ponto: a partir do corte os genes vem do segundo parente
+    cut = np.random.randint(0, genome_size, n_children)
+    from_p2 = np.arange(genome_size)[None, :] >= cut[:, None]
+    children = new_pop[ELITES:]
+    np.copyto(children, population[idx_p1])
+    np.copyto(children, population[idx_p2], where=from_p2)
+    
+    # Mutação esparsa: cada filho mutado recebe de 1 a 3 alterações gaussianas em genes aleatórios
+    mutated = np.random.random(n_children) < mutation_rate
+    mutation_points = np.where(mutated, np.random.randint(1, 4, n_children), 0)
+    rows = np.repeat(np.arange(n_children), mutation_points)
+    genes = np.random.randint(0, genome_size, len(rows))
+    np.add.at(children, (rows, genes), np.random.normal(0, mutation_sigma, len(rows)))
+
 def mutation(counter, gen):
     mutation_status = [
         (1, "Normal Rate x1"),
@@ -74,14 +570,29 @@ def mutation(counter, gen):
 
 # Função principal de treino
 # Exporta o melhor genoma e o gráfico de desempenho como arquivos
-def train():
+# resume: caminho de um checkpoint para continuar um treino interrompido (mesmo resultado de não ter parado)
+# island: ilha do modelo de ilhas (islands.py), troca os melhores genomas com a vizinha a cada island.interval gerações
+# Retorna o campeão e o melhor fitness da última geração
+def train(resume=None, island=None):
     
-    battle = BattleManager(verbose=VERBOSE) # Ativa o sistema de batalha
+    # Ativa o sistema de batalha
+    battle = make_battle(VERBOSE)
     dummy = AIBrain() # Falso cérebro para extrair o tamanho do genoma, não é utilizado mais depois
     genome_size = len(dummy.genome)
     
-    # Tensor de população e genoma de cada
-    population = [np.random.uniform(-1, 1, genome_size) for _ in range(POPULATION_SIZE)]
+    # Seeds reprodutíveis, obrigatórias quando a avaliação é dividida entre processos
+    # Aplicadas antes de sortear a população inicial, a geração 0 também sai da seed mestre
+    master_seed = MASTER_SEED
+    if master_seed is not None:
+        random.seed(master_seed)
+        np.random.seed(master_seed)
+    elif WORKERS > 1:
+        master_seed = random.randrange(2**32)
+    
+    # Tensor de população e genoma de cada (uma linha por genoma)
+    # Dois buffers pré-alocados que se revezam entre as gerações
+    population = np.random.uniform(-1, 1, (POPULATION_SIZE, genome_size)).astype(GENOME_DTYPE, copy=False)
+    new_pop = np.empty_like(population)
     
     # Histórico para o gráfico
     history_max_fitness = []
@@ -96,171 +607,262 @@ def train():
     current_mutation_rate = BASE_MUTATION_RATE
     current_mutation_sigma = BASE_MUTATION_SIGMA
     
-    print(f"Parâmetros de Treino:\n\tGerações: {GENERATIONS}\n\tPopulação: {POPULATION_SIZE}\n\tRodadas: {NUM_TESTS}")
+    # Lista de encontros do modo exato, calculada uma vez só
+    encounters = BattleManager.allEncounters() if EVAL_MODE == "exact" else None
+    rounds = len(encounters) if encounters is not None else NUM_TESTS
+    
+    # Cache de fitness (a avaliação por corrida tem seu próprio orçamento e no modo "common" todos os genomas
+    # da geração jogam o mesmo cronograma, nenhum dos dois usa o cache)
+    cache = FitnessCache(FITNESS_CACHE_SIZE) if FITNESS_CACHE and not RACING and EVAL_MODE != "common" else None
     
-    # Loop geracional
-    for gen in range(GENERATIONS):
-        # Parâmetros de mutação geracional
+    # Continua de um checkpoint
+    start_gen = 0
+    if resume is not None:
+        state = load_checkpoint(resume, cache)
+        if state["population"].shape != population.shape:
+            raise ValueError(f"Checkpoint com população {state['population'].shape}, esperado {population.shape}")
+        if state["population"].dtype != population.dtype:
+            raise ValueError(f"Checkpoint com genomas em {state['population'].dtype}, esperado {population.dtype} (GENOME_DTYPE)")
+        start_gen = int(state["gen"])
+        population[:] = state["population"]
+        champion = state["champion"]
+        master_seed = int(state["master_seed"]) if state["master_seed"] >= 0 else None
+        stagnation_counter = int(state["stagnation_counter"])
+        fitness_buffer = list(state["fitness_buffer"])
+        current_mutation_rate = float(state["mutation_rate"])
+        current_mutation_sigma = float(state["mutation_sigma"])
+        history_max_fitness = list(state["history_max_fitness"])
+        history_avg_fitness = list(state["history_avg_fitness"])
+        history_winrate = list(state["history_winrate"])
+        history_multiplier = list(state["history_multiplier"])
+        print(f"Continuando do checkpoint '{resume}' na geração {start_gen}")
+    
+    # Arquivo de linhagem, continuado junto com o checkpoint
+    archive = None
+    if ARCHIVE:
+        from lineage import LineageArchive, GROW_CHUNK
+        if resume is not None and os.path.exists(ARCHIVE_FILE):
+            archive = LineageArchive(ARCHIVE_FILE, "r+")
+            if archive.first + len(archive) < start_gen:
+                raise ValueError(f"'{ARCHIVE_FILE}' só vai até a geração {archive.first + len(archive) - 1}, o checkpoint está na {start_gen}")
+            archive.truncate(start_gen)
+        else:
+            archive = LineageArchive(ARCHIVE_FILE, "w", genome_size, POPULATION_SIZE, min(GROW_CHUNK, max(1, GENERATIONS - start_gen)), first=start_gen)
+    
+    # Métricas por geração, continuadas junto com o checkpoint
+    metrics = MetricsSink(METRICS_FILE, resume_at=start_gen if resume is not None else None)
+    profile_sink = None
+    if PROFILE:
+        profiling.enable(sys.modules[__name__])
+        profile_sink = MetricsSink(PROFILE_FILE, resume_at=start_gen if resume is not None else None)
+    
+    # Registro de batalhas, continuado junto com o checkpoint
+    recorder = None
+    if TRACE:
+        if ENGINE != "object":
+            raise ValueError(f"TRACE só funciona com ENGINE = \"object\", está \"{ENGINE}\"")
+        from battlelog import BattleRecorder
+        recorder = BattleRecorder(TRACE_FILE, TRACE_EVERY, TRACE_OUTCOMES, resume_at=start_gen if resume is not None else None)
+        battle.recorder = recorder
+        if resume is not None and "trace_seen" in state: recorder.seen = int(state["trace_seen"])
+    
+    # Pool de processos, a população vai pra eles via memória compartilhada
+    pool = None
+    shm = None
+    shared_pop = None
+    try:
+        if WORKERS > 1:
+            from multiprocessing import Pool, shared_memory
+            shm = shared_memory.SharedMemory(create=True, size=population.nbytes)
+            shared_pop = np.ndarray(population.shape, dtype=population.dtype, buffer=shm.buf)
+            pool = Pool(WORKERS, initializer=_init_worker, initargs=(shm.name, shared_pop.shape, shared_pop.dtype, encounters))
+    
+        print(f"Parâmetros de Treino:\n\tGerações: {GENERATIONS}\n\tPopulação: {POPULATION_SIZE}\n\tRodadas: {rounds} ({EVAL_MODE})")
+    
+        # Loop geracional
+        for gen in range(start_gen, GENERATIONS):
+            # Parâmetros de mutação geracional
          
-        generation_fitness = []
-        tally = [0,0,0] # [Derrota, Empate, Vitoria]
+            if pool is not None: shared_pop[:] = population # Escreve a geração na memória compartilhada
+            if recorder is not None: recorder.generation = gen
         
-        # Loop populacional
-        for i, genome in enumerate(population):
-            battle.active_genome = genome  # type: ignore
-            total_fit = 0
-            
-            # Loop de batalhas
-            for _ in range(NUM_TESTS):
-                battle.cleanup() 
-                outcome, dmg, foeMaxHP, totalHealed = battle.battleLoop()
-                tally[outcome + 1] += 1
-                
-                hero = battle.charList[0] 
-                died_dumb = False # Não se curou e morreu por causa disto
-                if outcome == -1: # Se morreu
-                    # Verifica se tinha algum move de cura (Target=1, Type=2) 
-                    # E se tinha SP/MP pra usar tal move
-                    has_heal_move = False
-                    for m_id in hero.moveList:
-                        m_data = moveSheet[m_id] # Precisaria importar moveSheet no train.py ou passar
-                        if m_data['Target'] == 1 and m_data['Type'] == 2: # É cura
-                             if hero.curSP >= m_data['SPCost'] and hero.curMP >= m_data['MPCost']:
-                                 has_heal_move = True
-                                 break
-                    if has_heal_move: # Se tinha, marca o genoma como "idiota"
-                        died_dumb = True
-                
-                hero_hp_pct = hero.curHP / hero.stats['HP'] # % de vida restante
-                turns = battle.turn # Total de turnos
-                
-                # Obtém o fitness da batalha
-                fit = calculate_fitness(outcome, turns, hero_hp_pct, dmg, foeMaxHP, died_dumb, totalHealed)
-                total_fit += fit
-            
-            avg_fitness = total_fit / NUM_TESTS
-            generation_fitness.append(avg_fitness)
-            
-        # Métricas da Geração
-        winrate = tally[2] / sum(tally)
-        best_gen_fit = np.max(generation_fitness)
-        avg_gen_fit = np.mean(generation_fitness)
+            gen_start = time.perf_counter()
+            profiler = None
+            if gen == PROFILE_GENERATION:
+                import cProfile
+                profiler = cProfile.Profile()
+                profiler.enable()
+            order = None # Ordem de seleção definida pela corrida
+            selection_fitness = None # Fitness de seleção da corrida (None = o próprio fitness da geração)
+            turns_saved = battle.turns_saved
+            battles_used = None
+            if RACING and EVAL_MODE != "exact":
+                generation_fitness, selection_fitness, tally, order, battles_used = race_generation(battle, pool, population, master_seed, gen)
+            else:
+                seeds = genome_seeds(master_seed, gen, len(population)) if master_seed is not None else None
+                schedule = BattleManager.rollSchedule(NUM_TESTS) if EVAL_MODE == "common" else None
+                if cache is not None:
+                    generation_fitness, tally = cached_evaluation(cache, battle, pool, population, encounters, seeds)
+                else:
+                    generation_fitness, tallies, _ = evaluate_generation(battle, pool, population, encounters, seeds, schedule)
+                    tally = [sum(t[k] for t in tallies) for k in range(3)] # [Derrota, Empate, Vitoria]
+        
+            # Métricas da Geração
+            winrate = tally[2] / sum(tally)
+            best_gen_fit = np.max(generation_fitness)
+            avg_gen_fit = np.mean(generation_fitness)
         
-        history_winrate.append(winrate)
-        history_max_fitness.append(best_gen_fit)
-        history_avg_fitness.append(avg_gen_fit)
+            history_winrate.append(winrate)
+            history_max_fitness.append(best_gen_fit)
+            history_avg_fitness.append(avg_gen_fit)
+            if archive is not None: archive.append(population, generation_fitness)
         
-        print(f"Gen {gen}: Winrate {winrate*100:.1f}% | MaxFit {best_gen_fit:.0f} | AvgFit {avg_gen_fit:.0f}")
+            log = f"Gen {gen}: Winrate {winrate*100:.1f}% | MaxFit {best_gen_fit:.0f} | AvgFit {avg_gen_fit:.0f}"
+            if battles_used is not None:
+                log += f" | Batalhas {battles_used} (economizou {POPULATION_SIZE * NUM_TESTS - battles_used})"
+            cache_hits = None
+            if cache is not None and cache.lookups > 0:
+                log += f" | Cache {cache.hits}/{cache.lookups} ({cache.hits / cache.lookups * 100:.0f}%)"
+                cache_hits = cache.hits
+                cache.reset_counters()
+            turns_saved = battle.turns_saved - turns_saved
+            if turns_saved > 0:
+                log += f" | Ciclos: {turns_saved} turnos poupados"
+            tag = f"[Ilha {island.index}] " if island is not None else ""
+            print(tag + log)
 
-        # Estagnação:
-        fitness_buffer.append(avg_gen_fit) # Adiciona no buffer
-        if len(fitness_buffer) >= 20:
-            # Pega os ultimos 20 valores médios
-            window = fitness_buffer[-20:]
-            # Média dos 10 primeiras vs 10 últimas desta janela
-            avg_old = sum(window[:10]) / 10
-            avg_new = sum(window[10:]) / 10
+            # Estagnação:
+            fitness_buffer.append(avg_gen_fit) # Adiciona no buffer
+            if len(fitness_buffer) >= 20:
+                # Pega os ultimos 20 valores médios
+                window = fitness_buffer[-20:]
+                # Média dos 10 primeiras vs 10 últimas desta janela
+                avg_old = sum(window[:10]) / 10
+                avg_new = sum(window[10:]) / 10
             
-            delta = avg_new - avg_old # Quantos aumentou
+                delta = avg_new - avg_old # Quantos aumentou
             
-            if delta < DELTA_P:
-                # Estagnou, aumenta o counter
-                stagnation_counter += 1
-                print(f"Estagnou, counter: {stagnation_counter}")
-            else:
-                # Melhorou! Zera o contador (ou decrementa se quiser ser bonzinho)
-                stagnation_counter = 0
+                if delta < DELTA_P:
+                    # Estagnou, aumenta o counter
+                    stagnation_counter += 1
+                    print(f"{tag}Estagnou, counter: {stagnation_counter}")
+                else:
+                    # Melhorou! Zera o contador (ou decrementa se quiser ser bonzinho)
+                    stagnation_counter = 0
                 
-            # Limpa o buffer
-            fitness_buffer = []
+                # Limpa o buffer
+                fitness_buffer = []
         
-        # Multiplicador de Mutação:
-        mutation_multiplier = mutation(stagnation_counter, gen)
-        history_multiplier.append(mutation_multiplier)
-        if mutation_multiplier != -1: # Mutação Normal
-            current_mutation_rate = BASE_MUTATION_RATE * mutation_multiplier
-            current_mutation_sigma = BASE_MUTATION_SIGMA * mutation_multiplier
-        else: # Genocídio
-            # Pega o último melhor genoma
-            stagnation_counter = 0 # Reseta o contator
-            fitness_buffer = [] # Esvazia o buffer
-            current_mutation_rate = BASE_MUTATION_RATE # Retorna ao normal
-            current_mutation_sigma = BASE_MUTATION_RATE
+            # Multiplicador de Mutação:
+            mutation_multiplier = mutation(stagnation_counter, gen)
+            history_multiplier.append(mutation_multiplier)
+            if mutation_multiplier != -1: # Mutação Normal
+                current_mutation_rate = BASE_MUTATION_RATE * mutation_multiplier
+                current_mutation_sigma = BASE_MUTATION_SIGMA * mutation_multiplier
+            else: # Genocídio
+                # Pega o último melhor genoma
+                stagnation_counter = 0 # Reseta o contator
+                fitness_buffer = [] # Esvazia o buffer
+                current_mutation_rate = BASE_MUTATION_RATE # Retorna ao normal
+                current_mutation_sigma = BASE_MUTATION_RATE
+        
+            metrics.write({
+                "gen": gen,
+                "winrate": winrate,
+                "max_fitness": best_gen_fit,
+                "avg_fitness": avg_gen_fit,
+                "multiplier": mutation_multiplier,
+                "mutation_rate": current_mutation_rate,
+                "mutation_sigma": current_mutation_sigma,
+                "stagnation": stagnation_counter,
+                "battles": battles_used,
+                "cache_hits": cache_hits,
+                "turns_saved": turns_saved,
+                "seconds": time.perf_counter() - gen_start,
+            })
             
-        # Seleção:
-        new_pop = []
-        best_idx = np.argmax(generation_fitness)
-        champion = population[best_idx] # Melhor genoma geracional
+            # Seleção:
+            best_idx = order[0] if order is not None else np.argmax(generation_fitness)
+            champion = population[best_idx].copy() # Melhor genoma geracional (cópia, o buffer será reaproveitado)
         
-        if mutation_multiplier == -1: # Genocídio
-            new_pop.append(champion.copy())
-            while len(new_pop) < POPULATION_SIZE:
-                 random_child = np.random.uniform(-1, 1, genome_size)
-                 new_pop.append(random_child)
-        else: # Reprodução Normal
-            # Elitismo: Top 1 serão preservados
-            sorted_indices = np.argsort(generation_fitness)[::-1]
-            for i in range(3):
-                new_pop.append(population[sorted_indices[i]].copy())
-
-            # Os melhores da fração 1/FRACTION serão guardados
-            # Ex: FRACTION = 2, .°. top 50% será passado adiante e o resto cortado fora
-            top_half_indices = sorted_indices[:int(POPULATION_SIZE/FRACTION)]
-
-            # Reprodução
-            while len(new_pop) < POPULATION_SIZE:
-                # Crossbreeding assexual
-                idx_p1 = np.random.choice(top_half_indices)
-                idx_p2 = np.random.choice(top_half_indices)
-
-                parent1 = population[idx_p1]
-                parent2 = population[idx_p2]
-
-                child = parent1.copy()
-                cut = random.randint(0, genome_size-1)
-                child[cut:] = parent2[cut:] # Quanto será passado adiante do segundo parente
-
-                # Mutação
-                if random.random() < current_mutation_rate:
-                    mutation_points = random.randint(1, 3) # Quantos casos de mutação ocorrerão
-                    for _ in range(mutation_points):
-                        idx = random.randint(0, genome_size-1) # Alguma seção aleatória do genoma
-                        child[idx] += np.random.normal(0, current_mutation_sigma) # Adiciona uma alteração aleatória baseada na curva gaussiana
-
-                new_pop.append(child)
-
-        population = new_pop
-                
+            if mutation_multiplier == -1: # Genocídio
+                new_pop[0] = champion
+                new_pop[1:] = np.random.uniform(-1, 1, (POPULATION_SIZE - 1, genome_size))
+            else: # Reprodução Normal
+                sorted_indices = order if order is not None else np.argsort(generation_fitness)[::-1]
+                if selection_fitness is None: selection_fitness = generation_fitness
+                reproduce(population, new_pop, sorted_indices, selection_fitness, current_mutation_rate, current_mutation_sigma)
+        
+            # Migração: os melhores desta geração vão pra ilha vizinha e os dela substituem os últimos filhos
+            if island is not None and (gen + 1) % island.interval == 0:
+                ranked = order if order is not None else np.argsort(generation_fitness)[::-1]
+                migrants = island.exchange(population[ranked[:island.migrants]])
+                new_pop[POPULATION_SIZE - len(migrants):] = migrants
+        
+            # Troca os buffers, a geração antiga vira o espaço da próxima
+            population, new_pop = new_pop, population
+        
+            # Perfil da geração
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(f"profile_gen{gen}.prof")
+                print(f"cProfile da geração {gen} salvo em: profile_gen{gen}.prof")
+            if profile_sink is not None:
+                profile_sink.write({"gen": gen, **profiling.summary(profiling.collect())})
+        
+            if CHECKPOINT_EVERY > 0 and (gen + 1) % CHECKPOINT_EVERY == 0:
+                if archive is not None: archive.flush() # Os arquivos nunca ficam atrás do checkpoint
+                metrics.flush()
+                if profile_sink is not None: profile_sink.flush()
+                if recorder is not None: recorder.flush()
+                save_checkpoint(CHECKPOINT_FILE, {
+                    "gen": gen + 1,
+                    "population": population,
+                    "champion": champion,
+                    "master_seed": master_seed if master_seed is not None else -1,
+                    "stagnation_counter": stagnation_counter,
+                    "fitness_buffer": np.array(fitness_buffer, dtype=np.float64),
+                    "mutation_rate": current_mutation_rate,
+                    "mutation_sigma": current_mutation_sigma,
+                    "history_max_fitness": history_max_fitness,
+                    "history_avg_fitness": history_avg_fitness,
+                    "history_winrate": history_winrate,
+                    "history_multiplier": history_multiplier,
+                    "trace_seen": recorder.seen if recorder is not None else 0,
+                }, cache)
+    except BaseException: # Erro ou Ctrl-C: derruba os trabalhadores sem esperar
+        if pool is not None: pool.terminate()
+        raise
+    finally: # O segmento em /dev/shm não pode sobrar depois do treino
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+    
+    if archive is not None: archive.close()
+    metrics.close()
+    if recorder is not None: recorder.close()
+    if profile_sink is not None:
+        profile_sink.close()
+        profiling.disable()
+    
     print("Treino Finalizado!")
     
-   # Gráfico
-    plt.figure(figsize=(12, 8))
-    plt.subplot(3, 1, 1)
-    plt.plot(history_max_fitness, label='Melhor Fitness', color='green')
-    plt.plot(history_avg_fitness, label='Fitness Médio', color='blue')
-    plt.title('Evolução do Fitness')
-    plt.legend()
-    plt.grid(True)
-    
-    plt.subplot(3, 1, 2)
-    plt.plot(history_winrate, label='Taxa de Vitória', color='orange')
-    plt.title('Taxa de Vitória')
-    plt.ylim(0, 1.0)
-    plt.grid(True)
-    
-    plt.subplot(3, 1, 3)
-    plt.plot(history_multiplier, label='Multiplicador', color='purple')
-    plt.title('Taxa de Mutação')
-    plt.ylim(-2, 17)
-    plt.grid(True)
-    
-    filename_img = 'resultado_treino.png'
-    plt.savefig(filename_img)
-    plt.close()
-    print(f"Gráfico salvo como: {filename_img}")
+    # Gráfico
+    if PLOT_AT_END:
+        import subprocess
+        plot_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "plot.py")
+        subprocess.run([sys.executable, plot_script, METRICS_FILE])
     
     # Genoma Campeão
-    save_genome(champion, "champion.json")
+    save_champion(champion, CHAMPION_FILE, len(history_max_fitness) - 1, history_max_fitness[-1] if history_max_fitness else None)
+    return champion, (history_max_fitness[-1] if history_max_fitness else None)
 
 if __name__ == "__main__":
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Treina o genoma do herói")
+    parser.add_argument("--resume", nargs="?", const=CHECKPOINT_FILE, default=None, metavar="CHECKPOINT",
+                        help=f"continua o treino a partir de um checkpoint (padrão: {CHECKPOINT_FILE})")
+    args = parser.parse_args()
+    train(resume=args.resume)
\ No newline at end of file